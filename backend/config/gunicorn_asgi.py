@@ -0,0 +1,18 @@
+"""
+gunicorn profile for ASGI: ``gunicorn -c config/gunicorn_asgi.py config.asgi:application``.
+
+Opt-in. Uvicorn workers run the async login and course read views on an event loop, so one worker
+serves many concurrent requests while they wait on the cache or the database. Every other view
+(progress writes, dashboard, bundle, payments, the Stripe webhook, admin) still runs on the
+worker's single thread-sensitive executor, one request at a time, and media loses ``sendfile()``;
+so workers are sized like the WSGI profile's.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault("DJANGO_ASYNC_VIEWS", "true")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+keepalive = 5
@@ -0,0 +1,17 @@
+"""
+gunicorn profile for WSGI: ``gunicorn -c config/gunicorn_wsgi.py config.wsgi:application``.
+
+The production profile (``railway.json``): the DRF views on threaded sync workers, with media sent
+through ``sendfile()``. Login and registration are async views, which Django runs on an event loop
+per request here; their hashing still goes through the bounded ``payments.hashing`` pool.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault("DJANGO_ASYNC_VIEWS", "false")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Requests mostly wait on the cache or the database; each thread holds one database connection.
+threads = int(os.environ.get("WEB_THREADS", 2))
@@ -0,0 +1,148 @@
+"""
+Serve ``MEDIA_ROOT`` in production (``SERVE_MEDIA``), for deployments without a separate file server.
+
+Responses carry an ``ETag`` and ``Last-Modified`` so repeat requests revalidate with a 304, honour
+single ``Range`` requests, prefer precompressed ``.br``/``.gz`` siblings when the client accepts
+them, and mark content-hashed names (``<name>.<12+ hex>.<ext>``, see ``courses.images``) as
+immutable. Files are returned as ``FileResponse`` so gunicorn's WSGI workers can hand them to
+``sendfile()``; under ASGI they are streamed in chunks instead.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12,64}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Checked in order of preference against Accept-Encoding.
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class FileRange:
+    """The first ``length`` bytes of ``fh`` from its current position, for a bounded byte range."""
+
+    def __init__(self, fh, length):
+        self.fh = fh
+        self.name = fh.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fh.close()
+
+
+@require_safe
+def serve(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    encoding, selected, st = _select_encoding(request, fullpath)
+    if st is None:
+        raise Http404("Not found")
+
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}{"-" + encoding if encoding else ""}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(st.st_mtime),
+        "Cache-Control": IMMUTABLE if HASHED_NAME.search(path) else f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}",
+    }
+
+    if _not_modified(request, etag, st.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = _file_response(request, selected, st.st_size, etag, content_type or "application/octet-stream")
+        if encoding:
+            response["Content-Encoding"] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    if encoding or any(_stat(fullpath + suffix) for _, suffix in PRECOMPRESSED):
+        patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def _select_encoding(request, fullpath):
+    """Pick the precompressed sibling the client accepts, else the file itself: ``(encoding, path, stat)``."""
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("Accept-Encoding", "").split(",")}
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in accepted:
+            st = _stat(fullpath + suffix)
+            if st is not None:
+                return encoding, fullpath + suffix, st
+    return "", fullpath, _stat(fullpath)
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or etag in parse_etags(if_none_match)
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _file_response(request, fullpath, size, etag, content_type):
+    byte_range = _parse_range(request, size, etag)
+    if byte_range == "invalid":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    fh = open(fullpath, "rb")
+    if byte_range is None:
+        response = FileResponse(fh, content_type=content_type)
+    else:
+        start, end = byte_range
+        fh.seek(start)
+        # A range running to the end of the file keeps the real file object, so sendfile() still applies.
+        body = fh if end == size - 1 else FileRange(fh, end - start + 1)
+        response = FileResponse(body, content_type=content_type, status=206)
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _parse_range(request, size, etag):
+    """``(start, end)`` for a satisfiable single range, ``None`` to send everything, or ``"invalid"``."""
+    header = request.headers.get("Range")
+    if not header or request.method != "GET":
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range is not None and if_range.strip() != etag:
+        return None  # the client's partial copy is outdated: send the whole file
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None  # multiple or malformed ranges: ignoring the header is allowed
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or start > end:
+        return "invalid"
+    return start, end
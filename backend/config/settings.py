@@ -1,4 +1,5 @@
 import os
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 from pathlib import Path
 from datetime import timedelta
@@ -14,6 +15,10 @@ load_dotenv()
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
 DEBUG = os.environ.get('DJANGO_DEBUG', 'False').lower() == 'true'  # Fixed this line
 AUTH_USER_MODEL = 'payments.User'
+AUTHENTICATION_BACKENDS = [
+    'payments.backends.EmailBackend',  # API login by email
+    'django.contrib.auth.backends.ModelBackend',  # admin login by username
+]
 ALLOWED_HOSTS = ['learncamera101.com', 'www.learncamera101.com', 'camera101-production.up.railway.app', 'http://localhost:5173']
 
 SIMPLE_JWT = {
@@ -23,6 +28,13 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
     "UPDATE_LAST_LOGIN": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "payments.views_auth.EntitlementTokenRefreshSerializer",
+}
+# Rotated refresh tokens are revoked in the cache, backed by payments.RevokedToken (see payments.blacklist).
+TOKEN_BLACKLIST = {
+    "BLOOM_CAPACITY": 1_000_000,  # minimum revocations the in-process filter holds before it is rebuilt larger
+    "BLOOM_ERROR_RATE": 0.001,  # share of unrevoked tokens that still need a database lookup
+    "SYNC_INTERVAL": 60,  # seconds between loading other processes' revocations into the filter
 }
 
 INSTALLED_APPS = [
@@ -37,6 +49,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'payments',
     'courses',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -55,7 +68,7 @@ ROOT_URLCONF = 'config.urls'
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "payments.authentication.CachedJWTAuthentication",
     )
 }
 
@@ -86,11 +99,15 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Lets the frontend revalidate prefetched lessons (conditional GETs answered with 304).
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
 
 # STRIPE SETTINGS
 STRIPE_SECRET_KEY = os.environ.get("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.environ.get("STRIPE_PUBLISHABLE_KEY")
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+STRIPE_EVENT_BATCH_SIZE = 500  # webhook events applied per transaction by payments.process_stripe_events
 
 # URL SETTINGS
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://learncamera101.com')
@@ -110,6 +127,58 @@ DATABASES = {
     }
 }
 
+# CACHE
+# Course snapshots are invalidated by bumping a shared version key, so every worker
+# must see the same cache; LocMemCache is only suitable for a single-process dev server.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+COURSE_SNAPSHOT_TIMEOUT = 60 * 60 * 24  # superseded versions simply age out
+ENTITLEMENTS_CACHE_TIMEOUT = 60 * 60  # purchases also invalidate explicitly
+AUTH_USER_CACHE_TIMEOUT = 5 * 60  # users resolved from JWTs; saves invalidate explicitly
+
+# Precompressed snapshot responses (courses.compression); brotli needs the Brotli package.
+RESPONSE_COMPRESSION = {
+    "MIN_SIZE": 1024,  # bytes; smaller bodies are sent uncompressed
+    "GZIP_LEVEL": 9,  # each encoding is compressed once per content version
+    "BROTLI_QUALITY": 9,  # 10-11 are several times slower for a few percent
+}
+
+# BACKGROUND JOBS (python manage.py runworker)
+JOBS = {
+    "CONCURRENCY": int(os.environ.get("JOBS_CONCURRENCY", 4)),  # worker threads per process
+    "POLL_INTERVAL": 1.0,  # seconds an idle worker thread sleeps between polls
+    "MAX_ATTEMPTS": 5,
+    "RETRY_BACKOFF": 10,  # seconds before the first retry, doubled per attempt
+    "MAX_BACKOFF": 60 * 60,
+    "LOCK_TIMEOUT": 15 * 60,  # a job running longer is assumed lost with its worker and requeued
+    "KEEP_DONE": 60 * 60 * 24 * 7,  # finished jobs are pruned after this many seconds
+    "MAINTENANCE_INTERVAL": 60,
+}
+
+# Route the course read endpoints to the async views in courses.views_async. Set by the ASGI
+# profile (config/gunicorn_asgi.py); under WSGI every async view would need its own event loop.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', 'False').lower() == 'true'
+
+# PASSWORD HASHING (payments.hashing): async login and registration hash in this bounded pool
+PASSWORD_HASHING = {
+    "CONCURRENCY": int(os.environ.get("PASSWORD_HASHING_CONCURRENCY", os.cpu_count() or 2)),  # threads per process
+    "MAX_QUEUE": int(os.environ.get("PASSWORD_HASHING_MAX_QUEUE", 64)),  # waiting hashes beyond this get a 503
+}
+
 # SECURITY MIDDLEWARE
 SECURE_SSL_REDIRECT = True  # Always redirect to HTTPS
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -125,6 +194,13 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # MEDIA FILES
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Serve MEDIA_ROOT from Django in production (config.media) when no CDN or file server fronts it.
+SERVE_MEDIA = os.environ.get('DJANGO_SERVE_MEDIA', 'False').lower() == 'true'
+MEDIA_CACHE_MAX_AGE = 60 * 60  # for media without a content hash in the name; hashed names are immutable
+# Responsive variants generated for each uploaded course image (see courses.images).
+COURSE_IMAGE_WIDTHS = [320, 640, 960, 1280, 1920]
+COURSE_IMAGE_FORMATS = ["avif", "webp", "jpeg"]  # preferred first
+COURSE_IMAGE_QUALITY = 80
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
@@ -0,0 +1,87 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from . import media
+
+HASHED = "course_images/variants/lens.640w.0123456789ab.webp"
+SVG = b"<svg>" + b" " * 500 + b"</svg>"
+
+
+class MediaServingTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        override = override_settings(MEDIA_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.body = bytes(range(256)) * 40
+        self.write(HASHED, self.body)
+        self.write("course_images/lens.svg", SVG)
+        self.write("course_images/lens.svg.gz", gzip.compress(SVG))
+
+    def write(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(content)
+
+    def get(self, path, **headers):
+        response = media.serve(RequestFactory().get(f"/media/{path}", headers=headers), path)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_full_response(self):
+        response, body = self.get(HASHED)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.body)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response["Cache-Control"], media.IMMUTABLE)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_unhashed_names_revalidate(self):
+        response, _ = self.get("course_images/lens.svg")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+    def test_conditional_requests(self):
+        response, _ = self.get(HASHED)
+        response, body = self.get(HASHED, if_none_match=response["ETag"])
+        self.assertEqual((response.status_code, body), (304, b""))
+        response, _ = self.get(HASHED, if_modified_since=http_date(os.path.getmtime(os.path.join(self.root, HASHED))))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.get(HASHED, if_none_match='"stale"')[0].status_code, 200)
+
+    def test_ranges(self):
+        response, body = self.get(HASHED, range="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.body[100:200])
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.body)}")
+        self.assertEqual(response["Content-Length"], "100")
+
+        self.assertEqual(self.get(HASHED, range="bytes=10000-")[1], self.body[10000:])
+        self.assertEqual(self.get(HASHED, range="bytes=-10")[1], self.body[-10:])
+        self.assertEqual(self.get(HASHED, range="bytes=99999-")[0].status_code, 416)
+        # A range on an outdated copy gets the whole file.
+        self.assertEqual(self.get(HASHED, range="bytes=0-9", if_range='"old"')[1], self.body)
+
+    def test_precompressed(self):
+        response, body = self.get("course_images/lens.svg", accept_encoding="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertEqual(gzip.decompress(body), SVG)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        response, body = self.get("course_images/lens.svg")
+        self.assertEqual(body, SVG)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_paths_outside_media_root(self):
+        for path in ["../settings.py", "course_images", "missing.webp"]:
+            with self.assertRaises(media.Http404):
+                self.get(path)
@@ -1,19 +1,32 @@
 from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config import media
+from payments import hashing
+
 def health_check(request):
     return JsonResponse({"status": "healthy", "service": "django-api"})
 
+
+@staff_member_required
+def hashing_stats(request):
+    # Staff only: the queue depth tells an attacker how close logins are to being turned away.
+    return JsonResponse(hashing.stats())
+
 urlpatterns = [
     path('', health_check),
     path('health/', health_check),
+    path('health/password-hashing/', hashing_stats),
     path('admin/', admin.site.urls),
     path('api/payments/', include('payments.urls')),
     path('api/courses/', include('courses.urls')),
 ]
 
-if settings.DEBUG:
+if settings.SERVE_MEDIA:
+    urlpatterns.append(re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", media.serve))
+elif settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
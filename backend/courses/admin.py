@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Course, Chapter, Lesson, LessonBlock, LessonProgress
+from django.db import transaction
+
+from jobs.queue import enqueue
+from .models import Course, Chapter, Lesson, LessonBlock, LessonProgress, CourseProgressSummary
 
 
 class LessonBlockInline(admin.TabularInline):
@@ -23,6 +26,16 @@ class CourseAdmin(admin.ModelAdmin):
     search_fields = ("title", "slug")
     inlines = []
 
+    def save_model(self, request, obj, form, change):
+        image_changed = "image" in form.changed_data
+        if image_changed:
+            obj.image_variants = []
+        super().save_model(request, obj, form, change)
+        if image_changed and obj.image and not str(obj.image).startswith("http"):
+            # Resizing takes seconds; a worker builds the variants once the upload is committed.
+            payload = {"course_id": obj.pk, "image": obj.image.name}
+            transaction.on_commit(lambda: enqueue("courses.generate_image_variants", payload))
+
 
 class ChapterInline(admin.TabularInline):
     model = Chapter
@@ -45,7 +58,7 @@ class ChapterAdmin(admin.ModelAdmin):
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
-    list_display = ("title", "chapter", "number", "order_index", "is_free_preview")
+    list_display = ("title", "chapter", "number", "order_index", "course_position", "is_free_preview")
     list_filter = ("chapter__course", "chapter")
     ordering = ("chapter", "order_index")
     prepopulated_fields = {"slug": ("title",)}
@@ -58,3 +71,8 @@ class LessonProgressAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "user__email", "lesson__title")
 
 
+@admin.register(CourseProgressSummary)
+class CourseProgressSummaryAdmin(admin.ModelAdmin):
+    list_display = ("user", "course", "completed_count", "total_count", "last_activity")
+    list_filter = ("course",)
+    search_fields = ("user__username", "user__email", "course__title")
@@ -5,4 +5,5 @@ class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
 
-
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,89 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Course
+
+CONTENT_VERSION_KEY = "courses:content-version"
+
+
+def _get_version(key: str, timeout=None) -> int:
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version lost to eviction never reuses an old number
+        # and serves snapshots that were built before the eviction.
+        cache.add(key, time.time_ns() // 1000, timeout=timeout)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key: str, timeout=None) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        _get_version(key, timeout)
+
+
+def get_content_version() -> int:
+    """Current version of the course content, shared by every worker through the cache."""
+    return _get_version(CONTENT_VERSION_KEY)
+
+
+async def aget_content_version() -> int:
+    version = await cache.aget(CONTENT_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CONTENT_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = await cache.aget(CONTENT_VERSION_KEY)
+    return version
+
+
+def bump_content_version() -> None:
+    _bump_version(CONTENT_VERSION_KEY)
+
+
+def _progress_version_key(user_id) -> str:
+    return f"courses:progress-version:{user_id}"
+
+
+def get_progress_version(user_id) -> int:
+    """Version of the user's lesson progress, for caching responses built from it."""
+    return _get_version(_progress_version_key(user_id), settings.COURSE_SNAPSHOT_TIMEOUT)
+
+
+def bump_progress_version(user_id) -> None:
+    _bump_version(_progress_version_key(user_id), settings.COURSE_SNAPSHOT_TIMEOUT)
+
+
+def snapshot_key(name: str, *parts) -> str:
+    return ":".join(["courses", "snapshot", str(get_content_version()), name, *map(str, parts)])
+
+
+async def asnapshot_key(name: str, *parts) -> str:
+    return ":".join(["courses", "snapshot", str(await aget_content_version()), name, *map(str, parts)])
+
+
+def get_snapshot(key: str, build):
+    """Return the cached snapshot under ``key``, building and storing it on a miss."""
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout=settings.COURSE_SNAPSHOT_TIMEOUT)
+    return data
+
+
+async def aget_snapshot(key: str, build):
+    """As ``get_snapshot``, with ``build`` a coroutine function."""
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, timeout=settings.COURSE_SNAPSHOT_TIMEOUT)
+    return data
+
+
+def get_course_id(slug: str):
+    """Course ID for ``slug`` (``None`` if there is none), cached with the content version."""
+    return get_snapshot(
+        snapshot_key("course-id", slug),
+        lambda: Course.objects.filter(slug=slug).values_list("id", flat=True).first(),
+    )
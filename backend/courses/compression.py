@@ -0,0 +1,102 @@
+"""
+Precompressed JSON responses for large, cacheable payloads (the course tree, lesson statuses).
+
+The rendered JSON is cached under a key that already carries the content version (see
+``courses.cache``), next to its gzip and brotli encodings. Each encoding is produced the first
+time a client asks for it and then served as-is, so compression is paid once per content change
+rather than once per request. Bodies under ``RESPONSE_COMPRESSION["MIN_SIZE"]`` stay uncompressed.
+"""
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+def _compress_br(body: bytes) -> bytes:
+    return brotli.compress(body, quality=settings.RESPONSE_COMPRESSION["BROTLI_QUALITY"])
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the bytes identical however often they are regenerated.
+    return gzip.compress(body, compresslevel=settings.RESPONSE_COMPRESSION["GZIP_LEVEL"], mtime=0)
+
+
+# In order of preference.
+ENCODINGS = [("br", _compress_br)] if brotli is not None else []
+ENCODINGS.append(("gzip", _compress_gzip))
+
+
+def accepted_encoding(request) -> str:
+    """The preferred encoding the client accepts (``q`` above 0), or "" for identity."""
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = part.partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return next((name for name, _ in ENCODINGS if name in accepted), "")
+
+
+def _variant_key(key: str, encoding: str) -> str:
+    return f"{key}:encoded:{encoding or 'identity'}"
+
+
+def _encode(identity: bytes, encoding: str):
+    """``(content_encoding, body)`` for ``identity`` in ``encoding``; small bodies are left as they are."""
+    if not encoding or len(identity) < settings.RESPONSE_COMPRESSION["MIN_SIZE"]:
+        return "", identity
+    return encoding, dict(ENCODINGS)[encoding](identity)
+
+
+def _response(content_encoding: str, body: bytes) -> HttpResponse:
+    response = HttpResponse(body, content_type="application/json")
+    if content_encoding:
+        response["Content-Encoding"] = content_encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def compressed_json(request, key: str, build) -> HttpResponse:
+    """
+    Respond with the JSON of ``build()`` in the best encoding the client accepts, from the cache
+    under ``key`` when it is there. ``key`` must change whenever the data does.
+    """
+    encoding = accepted_encoding(request)
+    variant = cache.get(_variant_key(key, encoding))
+    if variant is None:
+        identity = cache.get(_variant_key(key, "")) if encoding else None
+        if identity is None:
+            identity = _encode(JSONRenderer().render(build()), "")
+            cache.set(_variant_key(key, ""), identity, timeout=settings.COURSE_SNAPSHOT_TIMEOUT)
+        variant = _encode(identity[1], encoding)
+        if encoding:
+            cache.set(_variant_key(key, encoding), variant, timeout=settings.COURSE_SNAPSHOT_TIMEOUT)
+    return _response(*variant)
+
+
+async def acompressed_json(request, key: str, build) -> HttpResponse:
+    """As ``compressed_json``, with ``build`` a coroutine function."""
+    encoding = accepted_encoding(request)
+    variant = await cache.aget(_variant_key(key, encoding))
+    if variant is None:
+        identity = await cache.aget(_variant_key(key, "")) if encoding else None
+        if identity is None:
+            identity = _encode(JSONRenderer().render(await build()), "")
+            await cache.aset(_variant_key(key, ""), identity, timeout=settings.COURSE_SNAPSHOT_TIMEOUT)
+        variant = _encode(identity[1], encoding)
+        if encoding:
+            await cache.aset(_variant_key(key, encoding), variant, timeout=settings.COURSE_SNAPSHOT_TIMEOUT)
+    return _response(*variant)
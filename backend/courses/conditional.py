@@ -0,0 +1,87 @@
+"""
+Validators for course content responses, so clients holding a copy (e.g. from the lesson bundle)
+can revalidate it and get a 304 instead of the body.
+
+Lessons and chapters are validated from their own ``updated_at`` and the latest ``updated_at`` and
+row count of each level below them, read as annotations on the query that loads the object
+(``with_validators``), so a 304 costs no prefetch and no serialization. Course details are served
+from snapshots, whose cache key already changes with the content and doubles as the ETag.
+"""
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from .serializers import CHILD_FIELDS, LEVELS, sparse_cache_key
+
+
+def _etag(*parts) -> str:
+    # Weak: the same content may be sent in several encodings.
+    return f'W/"{hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()}"'
+
+
+def child_annotations(root: str, depth: str) -> dict:
+    """``<children>_updated_at`` and ``<children>_count`` for every level below ``root`` down to ``depth``."""
+    annotations, path = {}, ""
+    for level in LEVELS[LEVELS.index(root):LEVELS.index(depth)]:
+        child = CHILD_FIELDS[level]
+        path = f"{path}__{child}" if path else child
+        annotations[f"{child}_updated_at"] = Max(f"{path}__updated_at")
+        annotations[f"{child}_count"] = Count(path, distinct=True)
+    return annotations
+
+
+def with_validators(queryset, root: str, depth: str):
+    return queryset.annotate(**child_annotations(root, depth))
+
+
+def validators(obj, root: str, params, *extra):
+    """
+    ``(etag, last_modified)`` of ``obj`` (annotated by ``with_validators``) rendered with the sparse
+    ``params``. An edit moves a level's latest ``updated_at``, a deletion its count; ``extra``
+    covers anything else in the body, such as a lesson's ``previous``/``next`` links.
+    """
+    children = [getattr(obj, name) for name in child_annotations(root, params["depth"])]
+    timestamps = [obj.updated_at, *(value for value in children[::2] if value is not None)]
+    etag = _etag(
+        obj.pk,
+        *(value.isoformat() if hasattr(value, "isoformat") else value for value in [obj.updated_at, *children]),
+        json.dumps(extra, sort_keys=True),
+        sparse_cache_key(params),
+    )
+    return etag, max(timestamps)
+
+
+def snapshot_etag(key: str) -> str:
+    return _etag(key)
+
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def not_modified(request, etag: str, last_modified=None) -> bool:
+    """Whether ``If-None-Match`` (compared weakly) or, without it, ``If-Modified-Since`` still matches."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return if_none_match.strip() == "*" or _opaque(etag) in {_opaque(tag) for tag in parse_etags(if_none_match)}
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return (
+        last_modified is not None
+        and if_modified_since is not None
+        and int(last_modified.timestamp()) <= if_modified_since
+    )
+
+
+def set_validators(response, etag: str, last_modified=None, private: bool = False):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Always revalidate; the validators make that cheap.
+    if private:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
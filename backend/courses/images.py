@@ -0,0 +1,54 @@
+"""
+Responsive variants of course images.
+
+Each variant's filename contains a hash of its bytes, so a URL never changes content and can
+be cached forever; re-uploading an image produces new names instead of stale caches.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+VARIANT_DIR = "course_images/variants"
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+SAVE_OPTIONS = {"jpeg": {"optimize": True, "progressive": True}, "webp": {"method": 6}, "avif": {}}
+
+
+def variant_widths(width: int) -> list:
+    """Configured widths narrower than the source, plus the source width itself: never upscale."""
+    return [w for w in settings.COURSE_IMAGE_WIDTHS if w < width] + [width]
+
+
+def generate_variants(image_field) -> list:
+    """
+    Write every width/format variant of ``image_field`` to storage and describe them.
+
+    Returns ``[{"name", "width", "format"}]`` ordered by format preference, then width.
+    """
+    stem = os.path.splitext(os.path.basename(image_field.name))[0]
+    with image_field.open("rb") as fh:
+        source = Image.open(fh)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+
+    variants = []
+    for fmt in settings.COURSE_IMAGE_FORMATS:
+        for width in variant_widths(source.width):
+            image = source
+            if width != source.width:
+                image = source.resize((width, round(source.height * width / source.width)), Image.LANCZOS)
+            if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = BytesIO()
+            image.save(buffer, format=fmt.upper(), quality=settings.COURSE_IMAGE_QUALITY, **SAVE_OPTIONS[fmt])
+            content = buffer.getvalue()
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            name = f"{VARIANT_DIR}/{stem}.{width}w.{digest}.{'jpg' if fmt == 'jpeg' else fmt}"
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(content))
+            variants.append({"name": name, "width": width, "format": fmt})
+    return variants
@@ -0,0 +1,17 @@
+from jobs.queue import job
+
+from .cache import bump_content_version
+from .images import generate_variants
+from .models import Course
+
+
+@job("courses.generate_image_variants")
+def generate_image_variants(course_id, image):
+    """Build the responsive variants of a course image uploaded as ``image``."""
+    course = Course.objects.filter(pk=course_id, image=image).first()
+    if course is None:
+        return  # deleted, or the image was replaced and a newer job handles it
+    variants = generate_variants(course.image)
+    # update() rather than save(): the upload must not be re-queued, and only a still-current image gets them.
+    if Course.objects.filter(pk=course_id, image=image).update(image_variants=variants):
+        bump_content_version()
@@ -0,0 +1,93 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import QueryDict
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from courses.models import Chapter, Course, Lesson, LessonBlock
+from courses.serializers import CourseSerializer, parse_sparse_params, prefetch_path
+from courses.tree import course_tree
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare CPU time and allocations of the nested course serializers with courses.tree on a "
+        "generated catalog (12,000 blocks by default). The catalog is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--courses", type=int, default=5)
+        parser.add_argument("--chapters", type=int, default=10, help="Per course.")
+        parser.add_argument("--lessons", type=int, default=20, help="Per chapter.")
+        parser.add_argument("--blocks", type=int, default=12, help="Per lesson.")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, courses, chapters, lessons, blocks, repeat, **options):
+        with transaction.atomic():
+            self.seed(courses, chapters, lessons, blocks)
+            self.compare(repeat)
+            transaction.set_rollback(True)
+
+    def seed(self, courses, chapters, lessons, blocks):
+        started = time.perf_counter()
+        course_objs = Course.objects.bulk_create(
+            Course(title=f"Bench course {c}", slug=f"bench-course-{c}", price_eur="29.00") for c in range(courses)
+        )
+        chapter_objs = Chapter.objects.bulk_create(
+            Chapter(course=course, title=f"Chapter {ch}", slug=f"chapter-{ch}", order_index=ch)
+            for course in course_objs for ch in range(chapters)
+        )
+        lesson_objs = Lesson.objects.bulk_create(
+            Lesson(chapter=chapter, course_id=chapter.course_id, title=f"Lesson {n}", slug=f"lesson-{n}",
+                   number=n, order_index=n - 1, course_position=chapter.order_index * lessons + n)
+            for chapter in chapter_objs for n in range(1, lessons + 1)
+        )
+        text = "Aperture, shutter speed and ISO. " * 20
+        LessonBlock.objects.bulk_create(
+            (
+                LessonBlock(lesson=lesson, block_type=LessonBlock.TEXT, order_index=b,
+                            text_markdown=text, rendered_html=f"<p>{text}</p>")
+                for lesson in lesson_objs for b in range(blocks)
+            ),
+            batch_size=2000,
+        )
+        self.stdout.write(
+            f"Seeded {len(lesson_objs) * blocks} blocks in {len(lesson_objs)} lessons "
+            f"({time.perf_counter() - started:.1f}s)."
+        )
+
+    def compare(self, repeat):
+        request = RequestFactory().get("/api/courses/")
+        params = parse_sparse_params(QueryDict(""), "course")
+        context = {"request": request, **params}
+        queryset = Course.objects.filter(slug__startswith="bench-course-")
+
+        def serializers():
+            courses = queryset.prefetch_related(prefetch_path("course", params["depth"]))
+            return CourseSerializer(courses, many=True, context=context).data
+
+        def values():
+            return course_tree(queryset, context)
+
+        renderer = JSONRenderer()
+        if renderer.render(serializers()) != renderer.render(values()):
+            self.stderr.write(self.style.ERROR("Outputs differ."))
+
+        for name, build in [("serializers", serializers), ("values", values)]:
+            cpu = []
+            for _ in range(repeat):
+                started = time.process_time()
+                build()
+                cpu.append((time.process_time() - started) * 1000)
+            tracemalloc.start()
+            data = build()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del data
+            self.stdout.write(
+                f"{name:>11}: CPU {min(cpu):8.1f} ms (best of {repeat})  "
+                f"allocated at peak {peak / 2 ** 20:7.1f} MiB  result {retained / 2 ** 20:7.1f} MiB"
+            )
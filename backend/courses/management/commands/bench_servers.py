@@ -0,0 +1,140 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from courses.models import Course, Lesson
+
+User = get_user_model()
+
+PROFILES = {
+    "wsgi": ["config/gunicorn_wsgi.py", "config.wsgi:application"],
+    "asgi": ["config/gunicorn_asgi.py", "config.asgi:application"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the WSGI and the ASGI gunicorn profiles in turn against the current database and load "
+        "the course read endpoints at high concurrency; reports throughput and p50/p99 latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=256, help="Open connections.")
+        parser.add_argument("--duration", type=float, default=20, help="Seconds of load per profile.")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="gunicorn workers per profile.")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--profile", choices=sorted(PROFILES), action="append",
+                            help="Profiles to run (default: both).")
+
+    def handle(self, *args, concurrency, duration, workers, port, profile=None, **options):
+        paths = self.paths()
+        user, _ = User.objects.get_or_create(username="bench-servers", defaults={"email": "bench-servers@example.com"})
+        headers = (
+            f"Host: {settings.ALLOWED_HOSTS[0]}\r\n"
+            "X-Forwarded-Proto: https\r\n"  # behind Railway's proxy; avoids the SSL redirect
+            f"Authorization: Bearer {RefreshToken.for_user(user).access_token}\r\n"
+        )
+        for name in profile or ["wsgi", "asgi"]:
+            with self.server(name, port, workers):
+                # Warm the snapshot caches so both profiles are measured on the same hot path.
+                asyncio.run(self.load(port, paths, headers, concurrency=len(paths), duration=1))
+                latencies, errors = asyncio.run(self.load(port, paths, headers, concurrency, duration))
+            if not latencies:
+                raise CommandError(f"{name}: no successful requests ({errors} errors)")
+            latencies.sort()
+            self.stdout.write(
+                f"{name}: {len(latencies) / duration:8.0f} req/s  p50 {latencies[len(latencies) // 2]:7.1f} ms  "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1]:7.1f} ms  {errors} errors"
+            )
+
+    def paths(self):
+        course = Course.objects.order_by("id").first()
+        if course is None:
+            raise CommandError("Needs at least one course with lessons in the database.")
+        lesson = Lesson.objects.filter(course=course, is_free_preview=True).select_related("chapter").first()
+        paths = ["/api/courses/", f"/api/courses/{course.slug}/", f"/api/courses/{course.slug}/progress/"]
+        if lesson:
+            paths.append(f"/api/courses/{course.slug}/{lesson.chapter.slug}/{lesson.number}/")
+        return paths
+
+    @contextmanager
+    def server(self, name, port, workers):
+        config, app = PROFILES[name]
+        env = {**os.environ, "PORT": str(port), "WEB_CONCURRENCY": str(workers)}
+        env.pop("DJANGO_ASYNC_VIEWS", None)  # each profile sets its own
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", config, app],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_port(port, process)
+            yield
+        finally:
+            process.terminate()
+            process.wait()
+
+    def wait_for_port(self, port, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"gunicorn exited with status {process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"gunicorn did not listen on port {port} within {timeout}s")
+
+    async def load(self, port, paths, headers, concurrency, duration):
+        latencies, errors = [], [0]
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            self.client(port, paths[i % len(paths):] + paths[:i % len(paths)], headers, deadline, latencies, errors)
+            for i in range(concurrency)
+        ))
+        return latencies, errors[0]
+
+    async def client(self, port, paths, headers, deadline, latencies, errors):
+        """One keep-alive connection (re-opened when the server closes it) issuing GETs until ``deadline``."""
+        connection = None
+        i = 0
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection("127.0.0.1", port)
+                reader, writer = connection
+                writer.write(f"GET {path} HTTP/1.1\r\n{headers}\r\n".encode())
+                status = (await reader.readline()).split()[1]
+                length, keep_alive = 0, True
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                    elif name.lower() == "connection" and value.strip().lower() == "close":
+                        keep_alive = False
+                await reader.readexactly(length)
+            except (OSError, IndexError, asyncio.IncompleteReadError):
+                errors[0] += 1
+                connection = None
+                continue
+            if status.startswith(b"2"):
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors[0] += 1
+            if not keep_alive:
+                writer.close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = "Queue responsive variant generation for course images, e.g. ones uploaded before variants existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate courses that already have variants.")
+
+    def handle(self, *args, all=False, **options):
+        courses = Course.objects.exclude(image="").exclude(image__isnull=True).exclude(image__startswith="http")
+        if not all:
+            courses = courses.filter(image_variants=[])
+        queued = 0
+        for course_id, image in courses.values_list("id", "image"):
+            enqueue("courses.generate_image_variants", {"course_id": course_id, "image": image})
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} courses; run manage.py runworker to process them."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from courses.progress import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute course progress summaries, e.g. after lessons were added to or removed from a course."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", action="append", dest="courses", metavar="SLUG",
+                            help="Only rebuild this course (repeatable). Defaults to every course.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, courses=None, batch_size=1000, **options):
+        course_ids = None
+        if courses:
+            course_ids = list(Course.objects.filter(slug__in=courses).values_list("id", flat=True))
+            if len(course_ids) != len(set(courses)):
+                raise CommandError("Unknown course slug in: " + ", ".join(courses))
+
+        written = rebuild_summaries(course_ids, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} progress summaries."))
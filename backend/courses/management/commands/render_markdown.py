@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from courses.cache import bump_content_version
+from courses.models import Course, LessonBlock
+from courses.rendering import render_markdown
+
+
+class Command(BaseCommand):
+    help = "Render stored Markdown to HTML, e.g. after existing content was imported or the renderer changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, batch_size=500, **options):
+        updated = 0
+        for model in (Course, LessonBlock):
+            for source, target in model.MARKDOWN_FIELDS.items():
+                rows = model.objects.only("pk", source, target).order_by("pk")
+                changed = []
+                for obj in rows.iterator(chunk_size=batch_size):
+                    html = render_markdown(getattr(obj, source))
+                    if getattr(obj, target) != html:
+                        setattr(obj, target, html)
+                        changed.append(obj)
+                    if len(changed) >= batch_size:
+                        model.objects.bulk_update(changed, [target])
+                        updated += len(changed)
+                        changed = []
+                model.objects.bulk_update(changed, [target])
+                updated += len(changed)
+
+        if updated:
+            # bulk_update sends no signals, so drop the cached snapshots here.
+            bump_content_version()
+        self.stdout.write(self.style.SUCCESS(f"Rendered {updated} Markdown fields."))
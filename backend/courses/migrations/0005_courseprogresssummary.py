@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_summaries(apps, schema_editor):
+    Lesson = apps.get_model('courses', 'Lesson')
+    LessonProgress = apps.get_model('courses', 'LessonProgress')
+    CourseProgressSummary = apps.get_model('courses', 'CourseProgressSummary')
+
+    totals = dict(Lesson.objects.values_list('chapter__course_id').annotate(total=Count('id')).order_by())
+    rows = (
+        LessonProgress.objects.values('user_id', 'lesson__chapter__course_id')
+        .annotate(completed=Count('id', filter=Q(completed_at__isnull=False)), last_activity=Max('updated_at'))
+        .order_by()
+    )
+    CourseProgressSummary.objects.bulk_create(
+        [
+            CourseProgressSummary(
+                user_id=row['user_id'],
+                course_id=row['lesson__chapter__course_id'],
+                completed_count=row['completed'],
+                total_count=totals.get(row['lesson__chapter__course_id'], 0),
+                last_activity=row['last_activity'],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_price_eur'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgressSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_summaries', to='courses.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_activity'],
+                'indexes': [models.Index(fields=['user', '-last_activity'], name='progress_summary_recent_idx')],
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
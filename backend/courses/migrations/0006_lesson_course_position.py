@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_course_positions(apps, schema_editor):
+    Chapter = apps.get_model('courses', 'Chapter')
+    Lesson = apps.get_model('courses', 'Lesson')
+
+    for chapter in Chapter.objects.all():
+        Lesson.objects.filter(chapter=chapter).update(course_id=chapter.course_id)
+
+    for course_id in Chapter.objects.values_list('course_id', flat=True).distinct():
+        lessons = list(
+            Lesson.objects.filter(course_id=course_id).order_by('chapter__order_index', 'chapter_id', 'number', 'id')
+        )
+        for position, lesson in enumerate(lessons, start=1):
+            lesson.course_position = position
+        Lesson.objects.bulk_update(lessons, ['course_position'])
+
+
+def fire_deferred_constraint_checks(apps, schema_editor):
+    # The backfill's UPDATEs queue deferred foreign key checks, and PostgreSQL refuses to ALTER
+    # TABLE while trigger events are pending, so run them before course becomes NOT NULL.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_courseprogresssummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='courses.course'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='course_position',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_course_positions, migrations.RunPython.noop),
+        migrations.RunPython(fire_deferred_constraint_checks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lesson',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='courses.course'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'course_position'], name='lesson_course_position_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_lesson_course_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rendered_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='lessonblock',
+            name='rendered_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from courses.cache import bump_content_version
+from courses.rendering import render_markdown
+
+# Historical models have no MARKDOWN_FIELDS, so the sources are listed here.
+MARKDOWN_FIELDS = {"Course": "description_markdown", "LessonBlock": "text_markdown"}
+
+
+def render_existing_markdown(apps, schema_editor):
+    # Content saved before 0007 has no rendered_html; without this, ?render=html serves it empty
+    # until someone runs render_markdown by hand.
+    updated = 0
+    for model_name, source in MARKDOWN_FIELDS.items():
+        model = apps.get_model("courses", model_name)
+        rows = model.objects.exclude(**{source: ""}).filter(rendered_html="").only("pk", source).order_by("pk")
+        changed = []
+        for obj in rows.iterator(chunk_size=500):
+            obj.rendered_html = render_markdown(getattr(obj, source))
+            changed.append(obj)
+            if len(changed) >= 500:
+                model.objects.bulk_update(changed, ["rendered_html"])
+                updated += len(changed)
+                changed = []
+        model.objects.bulk_update(changed, ["rendered_html"])
+        updated += len(changed)
+    if updated:
+        # bulk_update sends no signals; drop snapshots cached with the empty HTML.
+        bump_content_version()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_existing_markdown, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .rendering import render_fields
+
 
 class TimeStampedModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -14,16 +17,24 @@ class Course(TimeStampedModel):
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description_markdown = models.TextField(blank=True, default="")
+    # Sanitized HTML of ``description_markdown``, rendered on save.
+    rendered_html = models.TextField(blank=True, default="", editable=False)
     stripe_price_id = models.CharField(max_length=255, blank=True, default="")
     price_eur = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, help_text="Price in EUR")
     image = models.ImageField(upload_to="course_images/", blank=True, null=True)
+    # Responsive copies of ``image``, written by the courses.generate_image_variants job.
+    image_variants = models.JSONField(blank=True, default=list, editable=False)
+
+    MARKDOWN_FIELDS = {"description_markdown": "rendered_html"}
 
     class Meta:
-        ordering = ["title"]
+        ordering = ["title", "id"]
+        indexes = [models.Index(fields=["title", "id"], name="course_title_idx")]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        kwargs["update_fields"] = render_fields(self, kwargs.get("update_fields"))
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -51,6 +62,9 @@ class Chapter(TimeStampedModel):
 
 class Lesson(TimeStampedModel):
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name="lessons")
+    # Denormalized from the chapter so course-wide ordering needs no join; kept in sync by save() and signals.
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="lessons", editable=False)
+    course_position = models.PositiveIntegerField(default=0, editable=False)
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, blank=True)
     order_index = models.PositiveIntegerField(default=0)
@@ -60,8 +74,34 @@ class Lesson(TimeStampedModel):
     class Meta:
         ordering = ["order_index", "id"]
         unique_together = (("chapter", "slug"), ("chapter", "number"))
+        indexes = [models.Index(fields=["course", "course_position"], name="lesson_course_position_idx")]
+
+    @classmethod
+    def renumber(cls, course_id: int) -> None:
+        """Rewrite ``course_position`` as 1..n in chapter order, then lesson number, for one course."""
+        lessons = (
+            cls.objects.filter(course_id=course_id)
+            .order_by("chapter__order_index", "chapter_id", "number", "id")
+            .only("id", "course_position")
+        )
+        changed = []
+        for position, lesson in enumerate(lessons, start=1):
+            if lesson.course_position != position:
+                lesson.course_position = position
+                changed.append(lesson)
+        cls.objects.bulk_update(changed, ["course_position"])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        lesson = super().from_db(db, field_names, values)
+        # The stored ordering, so saves that leave it alone skip renumbering (see courses.signals).
+        lesson._stored_order = (lesson.__dict__.get("chapter_id"), lesson.__dict__.get("number"))
+        return lesson
 
     def save(self, *args, **kwargs):
+        # Remember the stored course so the signal handler can close the gap a move leaves behind.
+        self._previous_course_id = self.course_id if self.pk else None
+        self.course_id = self.chapter.course_id
         if not self.slug:
             self.slug = slugify(self.title)
         if not self.number or self.number == 0:
@@ -95,13 +135,21 @@ class LessonBlock(TimeStampedModel):
 
     # Content fields. Only one or more will be used depending on type.
     text_markdown = models.TextField(blank=True, default="")
+    # Sanitized HTML of ``text_markdown``, rendered on save.
+    rendered_html = models.TextField(blank=True, default="", editable=False)
     image_urls = models.JSONField(blank=True, default=list)
     video_url = models.URLField(blank=True, default="")
     links = models.JSONField(blank=True, default=list)
 
+    MARKDOWN_FIELDS = {"text_markdown": "rendered_html"}
+
     class Meta:
         ordering = ["order_index", "id"]
 
+    def save(self, *args, **kwargs):
+        kwargs["update_fields"] = render_fields(self, kwargs.get("update_fields"))
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.lesson.title} block {self.order_index} ({self.block_type})"
 
@@ -118,8 +166,27 @@ class LessonProgress(TimeStampedModel):
     class Meta:
         unique_together = (("user", "lesson"),)
         ordering = ["-started_at", "id"]
+        # Keyset pagination of a user's history (courses.pagination.ProgressHistoryPagination).
+        indexes = [models.Index(fields=["user", "-started_at", "id"], name="progress_history_idx")]
 
     def __str__(self):
         status = "completed" if self.completed_at else "in-progress"
         return f"{self.user} / {self.lesson} ({status})"
 
+
+class CourseProgressSummary(models.Model):
+    """Per-user completion counts for a course, kept current as lessons are completed."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="course_progress")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="progress_summaries")
+    completed_count = models.PositiveIntegerField(default=0)
+    total_count = models.PositiveIntegerField(default=0)
+    last_activity = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = (("user", "course"),)
+        ordering = ["-last_activity"]
+        indexes = [models.Index(fields=["user", "-last_activity"], name="progress_summary_recent_idx")]
+
+    def __str__(self):
+        return f"{self.user} / {self.course} ({self.completed_count}/{self.total_count})"
@@ -0,0 +1,119 @@
+"""
+Keyset (cursor) pagination.
+
+The ``next`` link carries the ordering values of the page's last row, and the following page is
+read with a "comes after these values" condition on an index matching the ordering, so page 1,000
+costs the same as page 1. Unlike DRF's ``CursorPagination`` the cursor holds every ordering column,
+so rows tied on the leading one need no OFFSET. Links only go forward, which is all infinite lists need.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on ``ordering``, which must end with a unique column and match an index. Pages hold
+    ``page_size`` rows unless the client asks for another size, capped at ``max_page_size``.
+    """
+
+    ordering = ()
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def page_cache_key(self, request, model) -> str:
+        """Cache key of the requested page. An invalid cursor raises ``NotFound`` here, before any cache lookup."""
+        cursor = request.GET.get(self.cursor_query_param, "")
+        if cursor:
+            self.decode_cursor(model, cursor)
+        return f"{cursor}:{self.get_page_size(request)}"
+
+    def page_queryset(self, queryset, request):
+        """``queryset`` narrowed to the requested page, plus one row telling whether another follows."""
+        self.request = request
+        self.size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.GET.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(queryset.model, cursor)))
+        return queryset[:self.size + 1]
+
+    def get_page(self, rows) -> list:
+        """The page from the rows of ``page_queryset`` (model instances or ``.values()`` dicts)."""
+        rows = list(rows)
+        self.next_cursor = self.encode_cursor(rows[self.size - 1]) if len(rows) > self.size else None
+        return rows[:self.size]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(self.page_queryset(queryset, request))
+
+    def get_paginated_data(self, data) -> dict:
+        return {"next": self.get_next_link(), "results": data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def encode_cursor(self, row) -> str:
+        values = []
+        for name in self.ordering:
+            name = name.lstrip("-")
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            # isoformat() keeps the microseconds that DjangoJSONEncoder would drop.
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, model, cursor) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(cursor)
+            # None cannot be compared against, and to_python() would stringify lists and objects.
+            if any(value is None or isinstance(value, (list, dict)) for value in values):
+                raise ValueError(cursor)
+            return [
+                model._meta.get_field(name.lstrip("-")).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _after(self, values) -> Q:
+        """Rows after ``values`` in ``ordering``: a row comparison, spelled out so directions can differ."""
+        after, equal = Q(), Q()
+        for name, value in zip(self.ordering, values):
+            column = name.lstrip("-")
+            after |= equal & Q(**{f"{column}__{'lt' if name.startswith('-') else 'gt'}": value})
+            equal &= Q(**{column: value})
+        # A bound on the leading column alone lets the planner start the index scan at the cursor.
+        first = self.ordering[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]}) & after
+
+
+class CoursePagination(KeysetPagination):
+    ordering = ("title", "id")
+    page_size = 50
+
+
+class ProgressHistoryPagination(KeysetPagination):
+    ordering = ("-started_at", "id")
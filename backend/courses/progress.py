@@ -0,0 +1,275 @@
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .cache import bump_progress_version
+from .models import CourseProgressSummary, Lesson, LessonProgress
+from .serializers import ProgressEventSerializer
+
+MAX_BATCH_EVENTS = 500
+
+
+def percentage(completed: int, total: int) -> float:
+    return round(min(completed, total) / total * 100, 1) if total > 0 else 0
+
+
+def course_outline(course, user):
+    """
+    The course's lessons in order plus the IDs the user has completed, in two queries.
+
+    Lesson statuses, the next lesson and progress counts are all derived from this pair,
+    so callers never need to scan the lessons or ``LessonProgress`` again.
+    """
+    lessons = list(
+        Lesson.objects.filter(course=course)
+        .select_related("chapter")
+        .order_by("course_position")
+    )
+    completed_ids = set(
+        LessonProgress.objects.filter(
+            user=user, lesson__course=course, completed_at__isnull=False
+        ).values_list("lesson_id", flat=True)
+    )
+    return lessons, completed_ids
+
+
+def next_lesson(lessons, completed_ids):
+    """First lesson not yet completed, or ``None`` when every lesson is."""
+    return next((lesson for lesson in lessons if lesson.id not in completed_ids), None)
+
+
+def lesson_statuses(lessons, completed_ids, upcoming) -> list:
+    return [
+        {
+            "lesson_id": lesson.id,
+            "chapter_slug": lesson.chapter.slug,
+            "number": lesson.number,
+            "title": lesson.title,
+            "is_completed": lesson.id in completed_ids,
+            "is_next": lesson is upcoming,
+            "is_free_preview": lesson.is_free_preview
+        }
+        for lesson in lessons
+    ]
+
+
+def touch_summary(user, course_id: int, completed_delta: int = 0) -> None:
+    """
+    Record activity on a course, adding ``completed_delta`` newly completed lessons.
+
+    Callers must have written the ``LessonProgress`` change first, in the same transaction: a
+    missing summary is created from the progress rows, which then already include it.
+    """
+    now = timezone.now()
+    updated = CourseProgressSummary.objects.filter(user=user, course_id=course_id).update(
+        completed_count=F("completed_count") + completed_delta,
+        last_activity=now,
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            CourseProgressSummary.objects.create(
+                user=user,
+                course_id=course_id,
+                completed_count=LessonProgress.objects.filter(
+                    user=user, lesson__course_id=course_id, completed_at__isnull=False
+                ).count(),
+                total_count=Lesson.objects.filter(course_id=course_id).count(),
+                last_activity=now,
+            )
+    except IntegrityError:
+        # A concurrent request created the row first. It counted before this transaction's
+        # progress row was committed, so the change still has to be added.
+        CourseProgressSummary.objects.filter(user=user, course_id=course_id).update(
+            completed_count=F("completed_count") + completed_delta,
+            last_activity=now,
+        )
+
+
+def rebuild_summaries(course_ids=None, batch_size: int = 1000) -> int:
+    """Recompute every summary's counts from ``Lesson`` and ``LessonProgress``. Returns the rows written."""
+    lessons = Lesson.objects.all()
+    if course_ids is not None:
+        lessons = lessons.filter(course_id__in=course_ids)
+    totals = dict(lessons.values_list("course_id").annotate(total=Count("id")).order_by())
+
+    summaries = CourseProgressSummary.objects.all()
+    progress = LessonProgress.objects.all()
+    if course_ids is not None:
+        summaries = summaries.filter(course_id__in=course_ids)
+        progress = progress.filter(lesson__course_id__in=course_ids)
+
+    written = 0
+    with transaction.atomic():
+        # Courses whose lessons were all removed have no row in ``totals``.
+        summaries.exclude(course_id__in=totals.keys()).update(total_count=0, completed_count=0)
+        for course_id, total in totals.items():
+            summaries.filter(course_id=course_id).update(total_count=total, completed_count=0)
+
+        rows = (
+            progress.values("user_id", "lesson__course_id")
+            .annotate(
+                completed=Count("id", filter=Q(completed_at__isnull=False)),
+                last_activity=Max("updated_at"),
+            )
+            .order_by()
+        )
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            course_id = row["lesson__course_id"]
+            batch.append(
+                CourseProgressSummary(
+                    user_id=row["user_id"],
+                    course_id=course_id,
+                    completed_count=row["completed"],
+                    total_count=totals.get(course_id, 0),
+                    last_activity=row["last_activity"],
+                )
+            )
+            if len(batch) >= batch_size:
+                written += _upsert(batch)
+                batch = []
+        if batch:
+            written += _upsert(batch)
+    return written
+
+
+def refresh_course_totals(course_ids) -> None:
+    """Set every summary's ``total_count`` for ``course_ids`` from their current lessons, after lessons come or go."""
+    totals = dict(
+        Lesson.objects.filter(course_id__in=course_ids)
+        .values_list("course_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for course_id in course_ids:
+        CourseProgressSummary.objects.filter(course_id=course_id).update(total_count=totals.get(course_id, 0))
+
+
+def refresh_user_summaries(user, course_ids) -> None:
+    """Recount the user's summaries for ``course_ids`` with two grouped queries and one upsert."""
+    completed = dict(
+        LessonProgress.objects.filter(
+            user=user, lesson__course_id__in=course_ids, completed_at__isnull=False
+        )
+        .values_list("lesson__course_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    totals = dict(
+        Lesson.objects.filter(course_id__in=course_ids)
+        .values_list("course_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    now = timezone.now()
+    _upsert(
+        [
+            CourseProgressSummary(
+                user=user,
+                course_id=course_id,
+                completed_count=completed.get(course_id, 0),
+                total_count=totals.get(course_id, 0),
+                last_activity=now,
+            )
+            for course_id in course_ids
+        ],
+        update_fields=["completed_count", "total_count", "last_activity"],
+    )
+
+
+def sync_progress_events(user, events) -> list:
+    """
+    Apply a batch of offline ``start``/``complete`` events and return one result per event.
+
+    All lessons are resolved with one query and all ``LessonProgress`` rows are written with
+    one insert-on-conflict, so the query count does not grow with the batch size. Replaying
+    events is safe: the earliest ``started_at`` and ``completed_at`` always win.
+    """
+    results = [None] * len(events)
+    valid = {}
+    for index, event in enumerate(events):
+        serializer = ProgressEventSerializer(data=event)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            results[index] = {"index": index, "status": "invalid", "errors": serializer.errors}
+
+    lesson_keys = {(item["course_slug"], item["chapter_slug"], item["number"]) for item in valid.values()}
+    lessons = {}
+    if lesson_keys:
+        rows = Lesson.objects.filter(
+            reduce(or_, (
+                Q(course__slug=course_slug, chapter__slug=chapter_slug, number=number)
+                for course_slug, chapter_slug, number in lesson_keys
+            ))
+        ).values_list("course__slug", "chapter__slug", "number", "id", "course_id")
+        lessons = {row[:3]: row[3:] for row in rows}
+
+    now = timezone.now()
+    merged = {}
+    for index, item in valid.items():
+        found = lessons.get((item["course_slug"], item["chapter_slug"], item["number"]))
+        if not found:
+            results[index] = {"index": index, "status": "not_found"}
+            continue
+        lesson_id, course_id = found
+        timestamp = min(item.get("timestamp") or now, now)
+        started_at, completed_at, _ = merged.get(lesson_id, (timestamp, None, course_id))
+        started_at = min(started_at, timestamp)
+        if item["event"] == "complete":
+            completed_at = min(completed_at or timestamp, timestamp)
+        merged[lesson_id] = (started_at, completed_at, course_id)
+        results[index] = {"index": index, "status": "ok"}
+
+    if merged:
+        with transaction.atomic():
+            _upsert_progress(user.pk, merged, now)
+            refresh_user_summaries(user, sorted({course_id for _, _, course_id in merged.values()}))
+        # The upsert bypasses the LessonProgress signals.
+        bump_progress_version(user.pk)
+    return results
+
+
+def _upsert_progress(user_id: int, merged: dict, now) -> None:
+    qn = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    table = qn(LessonProgress._meta.db_table)
+    params = []
+    for lesson_id, (started_at, completed_at, _) in merged.items():
+        params += [user_id, lesson_id, adapt(started_at), adapt(completed_at), adapt(now), adapt(now)]
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(merged))
+    # CASE rather than LEAST() so a NULL completed_at never wins and the SQL stays portable.
+    sql = f"""
+        INSERT INTO {table} (user_id, lesson_id, started_at, completed_at, created_at, updated_at)
+        VALUES {values}
+        ON CONFLICT (user_id, lesson_id) DO UPDATE SET
+            started_at = CASE
+                WHEN EXCLUDED.started_at < {table}.started_at THEN EXCLUDED.started_at
+                ELSE {table}.started_at
+            END,
+            completed_at = CASE
+                WHEN {table}.completed_at IS NULL THEN EXCLUDED.completed_at
+                WHEN EXCLUDED.completed_at IS NULL OR {table}.completed_at <= EXCLUDED.completed_at
+                    THEN {table}.completed_at
+                ELSE EXCLUDED.completed_at
+            END,
+            updated_at = EXCLUDED.updated_at
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _upsert(summaries, update_fields=("completed_count", "total_count")) -> int:
+    CourseProgressSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["user", "course"],
+        update_fields=list(update_fields),
+    )
+    return len(summaries)
@@ -0,0 +1,26 @@
+import markdown
+import nh3
+
+MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]
+
+
+def render_markdown(text: str) -> str:
+    """Markdown to HTML that is safe to insert into the page as is."""
+    if not text:
+        return ""
+    html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS, output_format="html")
+    return nh3.clean(html, link_rel="noopener noreferrer")
+
+
+def render_fields(instance, update_fields=None):
+    """
+    Fill each ``rendered_html`` field from its Markdown source (``instance.MARKDOWN_FIELDS``).
+
+    Returns ``update_fields`` with the rendered fields added when their source is being saved.
+    """
+    for source, target in instance.MARKDOWN_FIELDS.items():
+        if update_fields is None or source in update_fields:
+            setattr(instance, target, render_markdown(getattr(instance, source)))
+            if update_fields is not None:
+                update_fields = {*update_fields, target}
+    return update_fields
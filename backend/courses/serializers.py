@@ -1,9 +1,91 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import Course, Chapter, Lesson, LessonBlock
+from .images import MIME_TYPES
+from .models import Course, Chapter, Lesson, LessonBlock, LessonProgress
 from rest_framework import serializers
 
+# Levels of the course tree, outermost first, and the field nesting each level's children.
+LEVELS = ["course", "chapter", "lesson", "block"]
+CHILD_FIELDS = {"course": "chapters", "chapter": "lessons", "lesson": "blocks"}
+RENDER_FORMATS = ["markdown", "html"]
+
+
+def parse_sparse_params(query_params, root: str) -> dict:
+    """
+    Read ``?depth=<level>``, ``?fields=a,b`` / ``?fields[<level>]=a,b`` and ``?render=markdown|html``
+    for a tree rooted at ``root``.
+
+    The returned depth is already reduced when a level's field list leaves out its children,
+    so callers can use it directly to decide what to prefetch.
+    """
+    levels = LEVELS[LEVELS.index(root):]
+    depth = query_params.get("depth", levels[-1])
+    if depth not in levels:
+        raise serializers.ValidationError({"depth": [f"Must be one of: {', '.join(levels)}."]})
+    render = query_params.get("render", RENDER_FORMATS[0])
+    if render not in RENDER_FORMATS:
+        raise serializers.ValidationError({"render": [f"Must be one of: {', '.join(RENDER_FORMATS)}."]})
+
+    fields = {}
+    for level in levels:
+        raw = query_params.get(f"fields[{level}]")
+        if raw is None and level == root:
+            raw = query_params.get("fields")
+        if raw:
+            fields[level] = {name.strip() for name in raw.split(",") if name.strip()}
+            # Unknown names would only mint new snapshot keys, so they are refused.
+            unknown = fields[level] - SELECTABLE_FIELDS[level]
+            if unknown:
+                raise serializers.ValidationError(
+                    {"fields": [f"Unknown {level} field(s): {', '.join(sorted(unknown))}."]}
+                )
+
+    for level in levels[:levels.index(depth)]:
+        if level in fields and CHILD_FIELDS[level] not in fields[level]:
+            depth = level
+            break
+
+    return {"depth": depth, "fields": fields, "render": render}
+
+
+def sparse_cache_key(params: dict) -> str:
+    selected = ";".join(f"{level}={','.join(sorted(names))}" for level, names in sorted(params["fields"].items()))
+    return f"{params['depth']}|{params['render']}|{selected}"
+
+
+def prefetch_path(root: str, depth: str) -> str:
+    """Relation path to prefetch from ``root`` down to ``depth``, or "" when nothing nested is needed."""
+    levels = LEVELS[LEVELS.index(root):LEVELS.index(depth)]
+    return "__".join(CHILD_FIELDS[level] for level in levels)
+
+
+class SparseFieldsMixin:
+    """Drop fields outside the ``depth``/``fields``/``render`` selection that views put in the serializer context."""
+
+    level = None
+    # Markdown field -> field serving its pre-rendered HTML; ``?render=html`` swaps one for the other.
+    markdown_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        render_html = self.context.get("render") == "html"
+        for source, rendered in self.markdown_fields.items():
+            fields.pop(source if render_html else rendered, None)
+        depth = self.context.get("depth")
+        child = CHILD_FIELDS.get(self.level)
+        if child and depth and LEVELS.index(depth) <= LEVELS.index(self.level):
+            fields.pop(child, None)
+        selected = self.context.get("fields", {}).get(self.level)
+        if selected:
+            fields = {name: field for name, field in fields.items() if name in selected}
+        return fields
+
+
+class LessonBlockSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    level = "block"
+    markdown_fields = {"text_markdown": "text_html"}
+    text_html = serializers.CharField(source="rendered_html", read_only=True)
 
-class LessonBlockSerializer(serializers.ModelSerializer):
     class Meta:
         model = LessonBlock
         fields = [
@@ -11,13 +93,15 @@ class LessonBlockSerializer(serializers.ModelSerializer):
             "block_type",
             "order_index",
             "text_markdown",
+            "text_html",
             "image_urls",
             "video_url",
             "links",
         ]
 
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    level = "lesson"
     blocks = LessonBlockSerializer(many=True, read_only=True)
 
     class Meta:
@@ -33,7 +117,8 @@ class LessonSerializer(serializers.ModelSerializer):
         ]
 
 
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    level = "chapter"
     lessons = LessonSerializer(many=True, read_only=True)
 
     class Meta:
@@ -47,9 +132,14 @@ class ChapterSerializer(serializers.ModelSerializer):
         ]
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    level = "course"
+    markdown_fields = {"description_markdown": "description_html"}
     chapters = ChapterSerializer(many=True, read_only=True)
+    description_html = serializers.CharField(source="rendered_html", read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    price_eur = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True)
 
     class Meta:
         model = Course
@@ -58,20 +148,70 @@ class CourseSerializer(serializers.ModelSerializer):
             "title",
             "slug",
             "description_markdown",
+            "description_html",
             "image_url",
+            "image_srcset",
+            "price_eur",
             "chapters",
         ]
 
     def get_image_url(self, obj: Course):
-        if obj.image:
-            image_str = str(obj.image)
-            if image_str.startswith("http"):  # already a Cloudinary URL
-                return image_str
-            # else build the local media URL
-            request = self.context.get("request")
-            if request:
-                return request.build_absolute_uri(obj.image.url)
-            return obj.image.url
+        return image_url(obj.image.name, self.context.get("request"))
+
+    def get_image_srcset(self, obj: Course):
+        return image_srcset(obj.image_variants, self.context.get("request"))
+
+
+# What ``?fields=`` may select at each level; lesson responses also carry ``previous``/``next`` links.
+SELECTABLE_FIELDS = {
+    "course": set(CourseSerializer.Meta.fields),
+    "chapter": set(ChapterSerializer.Meta.fields),
+    "lesson": {*LessonSerializer.Meta.fields, "previous", "next"},
+    "block": set(LessonBlockSerializer.Meta.fields),
+}
+
+
+def image_url(name, request=None) -> str:
+    """Absolute URL of a course image stored as ``name`` ("" when there is none)."""
+    if not name:
         return ""
+    if name.startswith("http"):  # already a Cloudinary URL
+        return name
+    return _media_url(default_storage.url(name), request)
+
 
+def image_srcset(variants, request=None) -> list:
+    """Responsive variants as ``[{url, width, type}]``, preferred format first; empty until generated."""
+    return [
+        {
+            "url": _media_url(default_storage.url(variant["name"]), request),
+            "width": variant["width"],
+            "type": MIME_TYPES[variant["format"]],
+        }
+        for variant in variants
+    ]
 
+
+def _media_url(url, request):
+    if request:
+        return request.build_absolute_uri(url)
+    return url
+
+
+class ProgressEventSerializer(serializers.Serializer):
+    course_slug = serializers.SlugField()
+    chapter_slug = serializers.SlugField()
+    number = serializers.IntegerField(min_value=1)
+    event = serializers.ChoiceField(choices=["start", "complete"])
+    timestamp = serializers.DateTimeField(required=False)
+
+
+class ProgressHistorySerializer(serializers.ModelSerializer):
+    course_slug = serializers.CharField(source="lesson.course.slug")
+    chapter_slug = serializers.CharField(source="lesson.chapter.slug")
+    number = serializers.IntegerField(source="lesson.number")
+    title = serializers.CharField(source="lesson.title")
+
+    class Meta:
+        model = LessonProgress
+        fields = ["id", "course_slug", "chapter_slug", "number", "title", "started_at", "completed_at"]
@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+
+from .cache import bump_content_version, bump_progress_version
+from .models import Chapter, Course, Lesson, LessonBlock, LessonProgress
+from .progress import refresh_course_totals
+
+
+def invalidate_course_snapshots(sender, **kwargs):
+    # After commit: bumped earlier, a concurrent reader could rebuild the new version from the old rows.
+    transaction.on_commit(bump_content_version)
+
+
+def invalidate_progress_snapshots(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_progress_version(user_id))
+
+
+def renumber_lessons_after_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_course_id", None)
+    stored, instance._stored_order = getattr(instance, "_stored_order", None), (instance.chapter_id, instance.number)
+    if not created and previous == instance.course_id and stored == instance._stored_order:
+        return  # e.g. a title or content edit: the course order is unchanged
+    Lesson.renumber(instance.course_id)
+    if previous and previous != instance.course_id:
+        Lesson.renumber(previous)
+
+
+def refresh_totals_after_save(sender, instance, created, raw=False, **kwargs):
+    """A lesson added to or moved between courses changes their progress summaries' totals."""
+    if raw:
+        return
+    previous = getattr(instance, "_previous_course_id", None)
+    if created or (previous and previous != instance.course_id):
+        refresh_course_totals({instance.course_id, previous} - {None})
+
+
+def _deleted_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _first_in_deletion(origin, course_id) -> bool:
+    """
+    Whether the deletion started by ``origin`` has not yet renumbered ``course_id``. The collector
+    deletes all rows of a model before sending their ``post_delete`` signals, so once per course is enough.
+    """
+    if origin is None:
+        return True
+    handled = vars(origin).setdefault("_renumbered_course_ids", set())
+    if course_id in handled:
+        return False
+    handled.add(course_id)
+    return True
+
+
+def lesson_deleted(sender, instance, origin=None, **kwargs):
+    if origin is not None and _deleted_model(origin) is not Lesson:
+        return  # deleted with its chapter or course, which renumber once (see chapter_deleted)
+    if _first_in_deletion(origin, instance.course_id):
+        Lesson.renumber(instance.course_id)
+        refresh_course_totals([instance.course_id])
+
+
+def chapter_deleted(sender, instance, origin=None, **kwargs):
+    if origin is not None and _deleted_model(origin) is Course:
+        return  # the course's lessons and summaries are gone too
+    if _first_in_deletion(origin, instance.course_id):
+        Lesson.renumber(instance.course_id)
+        refresh_course_totals([instance.course_id])
+
+
+def sync_chapter_lessons(sender, instance, raw=False, **kwargs):
+    """Chapter order or course changed: carry its lessons along and renumber the affected courses."""
+    if raw:
+        return
+    moved_from = set(
+        Lesson.objects.filter(chapter=instance).exclude(course_id=instance.course_id).values_list("course_id", flat=True)
+    )
+    if moved_from:
+        Lesson.objects.filter(chapter=instance).update(course_id=instance.course_id)
+        refresh_course_totals(moved_from | {instance.course_id})
+    for course_id in moved_from | {instance.course_id}:
+        Lesson.renumber(course_id)
+
+
+for model in (Course, Chapter, Lesson, LessonBlock):
+    post_save.connect(invalidate_course_snapshots, sender=model, dispatch_uid=f"snapshot-save-{model.__name__}")
+    post_delete.connect(invalidate_course_snapshots, sender=model, dispatch_uid=f"snapshot-delete-{model.__name__}")
+post_save.connect(invalidate_progress_snapshots, sender=LessonProgress, dispatch_uid="progress-snapshot-save")
+post_delete.connect(invalidate_progress_snapshots, sender=LessonProgress, dispatch_uid="progress-snapshot-delete")
+
+post_save.connect(renumber_lessons_after_save, sender=Lesson, dispatch_uid="lesson-renumber-save")
+post_delete.connect(lesson_deleted, sender=Lesson, dispatch_uid="lesson-renumber-delete")
+post_save.connect(refresh_totals_after_save, sender=Lesson, dispatch_uid="lesson-totals-save")
+post_save.connect(sync_chapter_lessons, sender=Chapter, dispatch_uid="chapter-renumber-save")
+post_delete.connect(chapter_deleted, sender=Chapter, dispatch_uid="chapter-renumber-delete")
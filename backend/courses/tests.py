@@ -0,0 +1,666 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from jobs.queue import run_pending
+from payments.models import CoursePurchase, User
+
+from . import compression, views_async
+from .admin import CourseAdmin
+from .cache import get_content_version
+from .models import Chapter, Course, Lesson, LessonBlock, LessonProgress
+from .pagination import CoursePagination, ProgressHistoryPagination
+from .progress import rebuild_summaries
+from .serializers import CourseSerializer, parse_sparse_params, prefetch_path
+from .tree import course_tree
+from .views import ChapterDetailView, CourseDashboardView, LessonBundleView
+
+COURSES = 3
+CHAPTERS_PER_COURSE = 4
+LESSONS_PER_CHAPTER = 6
+BLOCKS_PER_LESSON = 3
+
+# Tables that grow with content or users; a sequential scan on any of them is a missing index.
+LARGE_TABLES = [
+    Lesson._meta.db_table,
+    LessonBlock._meta.db_table,
+    LessonProgress._meta.db_table,
+    CoursePurchase._meta.db_table,
+    User._meta.db_table,
+]
+
+
+class CatalogDataMixin:
+    """
+    Seeds a catalog large enough that an N+1 query pattern blows through any budget:
+    3 courses x 4 chapters x 6 lessons x 3 blocks, learners with purchases and progress.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.courses = []
+        for c in range(COURSES):
+            course = Course.objects.create(title=f"Course {c}", price_eur="29.00", description_markdown="# Intro")
+            cls.courses.append(course)
+            for ch in range(CHAPTERS_PER_COURSE):
+                chapter = Chapter.objects.create(course=course, title=f"Chapter {ch}", order_index=ch)
+                for number in range(1, LESSONS_PER_CHAPTER + 1):
+                    lesson = Lesson.objects.create(
+                        chapter=chapter, title=f"Lesson {number}", number=number, is_free_preview=number == 1
+                    )
+                    LessonBlock.objects.bulk_create(
+                        LessonBlock(lesson=lesson, block_type=LessonBlock.TEXT, order_index=b, text_markdown="Text " * 50)
+                        for b in range(BLOCKS_PER_LESSON)
+                    )
+
+        cls.course = cls.courses[0]
+        cls.chapter = cls.course.chapters.first()
+        cls.learner = User.objects.create_user(username="learner", email="learner@example.com", password="pw-learner-1")
+        cls.others = [
+            User.objects.create_user(username=f"user{i}", email=f"user{i}@example.com", password="pw")
+            for i in range(5)
+        ]
+        CoursePurchase.objects.create(user=cls.learner, course=cls.course)
+        for user in [cls.learner, *cls.others]:
+            for lesson in Lesson.objects.filter(course=cls.course).order_by("course_position")[:10]:
+                LessonProgress.objects.create(user=user, lesson=lesson, completed_at=lesson.created_at)
+        rebuild_summaries()
+        cls.last_chapter = cls.course.chapters.last()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def auth(self, user=None):
+        token = RefreshToken.for_user(user or self.learner).access_token
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def lesson_url(self, number=2, suffix="", chapter=None):
+        return f"/api/courses/{self.course.slug}/{(chapter or self.chapter).slug}/{number}/{suffix}"
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        """Fail when the block runs more than ``budget`` queries, listing what ran."""
+        with CaptureQueriesContext(connection) as ctx:
+            yield
+        queries = "\n".join(f"{i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, start=1))
+        self.assertLessEqual(len(ctx), budget, f"{len(ctx)} queries over a budget of {budget}:\n{queries}")
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class CourseQueryBudgetTests(CatalogDataMixin, TestCase):
+    """Per-route query budgets for ``courses.urls``. Budgets include JWT's user lookup."""
+
+    def test_course_list(self):
+        with self.assertQueryBudget(5):
+            response = self.client.get("/api/courses/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), COURSES)
+
+    def test_course_list_is_served_from_snapshot(self):
+        self.client.get("/api/courses/")
+        with self.assertQueryBudget(0):
+            self.client.get("/api/courses/")
+
+    def test_snapshots_are_invalidated_on_commit(self):
+        version = get_content_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.save()
+            self.assertEqual(get_content_version(), version)
+        self.assertNotEqual(get_content_version(), version)
+
+    def test_course_list_catalog_fields(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get("/api/courses/?fields=title,slug,image_url,price_eur")
+        self.assertEqual(set(response.json()["results"][0]), {"title", "slug", "image_url", "price_eur"})
+
+    def test_course_detail(self):
+        with self.assertQueryBudget(4):
+            response = self.client.get(f"/api/courses/{self.course.slug}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["chapters"]), CHAPTERS_PER_COURSE)
+
+    def test_lesson_by_number_free_preview(self):
+        with self.assertQueryBudget(3):
+            response = self.client.get(self.lesson_url(number=1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["blocks"]), BLOCKS_PER_LESSON)
+
+    def test_lesson_by_number_gates_paid_lessons(self):
+        self.assertEqual(self.client.get(self.lesson_url()).status_code, 401)
+        self.assertEqual(self.client.get(self.lesson_url(), **self.auth(self.others[0])).status_code, 403)
+
+    def test_lesson_by_number_entitled(self):
+        self.client.get(self.lesson_url(), **self.auth())
+        # User, lesson, blocks, neighbours: the entitlement check is served from the cache.
+        with self.assertQueryBudget(4):
+            response = self.client.get(self.lesson_url(), **self.auth())
+        self.assertEqual(response.status_code, 200)
+
+    def test_entitlements_follow_purchases(self):
+        buyer = self.others[0]
+        self.assertEqual(self.client.get(self.lesson_url(), **self.auth(buyer)).status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            CoursePurchase.objects.create(user=buyer, course=self.course)
+        self.assertEqual(self.client.get(self.lesson_url(), **self.auth(buyer)).status_code, 200)
+
+    def test_lesson_bundle(self):
+        with self.assertQueryBudget(1 + LessonBundleView.QUERY_BUDGET):
+            response = self.client.get(self.lesson_url(suffix="bundle/"), **self.auth())
+        lessons = response.json()["lessons"]
+        self.assertEqual([entry["number"] for entry in lessons], [2, 3, 4, 5])
+        self.assertEqual({len(entry["lesson"]["blocks"]) for entry in lessons}, {BLOCKS_PER_LESSON})
+        self.assertEqual(lessons[0]["lesson"]["previous"]["number"], 1)
+
+    def test_lesson_bundle_locks_paid_lessons(self):
+        self.assertEqual(self.client.get(self.lesson_url(suffix="bundle/")).status_code, 401)
+        response = self.client.get(self.lesson_url(number=1, suffix="bundle/?count=6"), **self.auth(self.others[0]))
+        lessons = response.json()["lessons"]
+        # Lesson 1 of every chapter is a free preview; the next chapter's first lesson closes the window.
+        self.assertEqual([entry["locked"] for entry in lessons], [False] + [True] * 5 + [False])
+        self.assertEqual(lessons[-1]["chapter_slug"], self.course.chapters.all()[1].slug)
+        self.assertIsNone(lessons[1]["lesson"])
+
+    def test_lesson_bundle_etags(self):
+        def etags(number):
+            lessons = self.client.get(self.lesson_url(number=number, suffix="bundle/"), **self.auth()).json()["lessons"]
+            return {entry["number"]: entry["etag"] for entry in lessons}
+
+        first = etags(2)
+        self.assertEqual(etags(3)[3], first[3])
+        block = LessonBlock.objects.filter(lesson__chapter=self.chapter, lesson__number=3).first()
+        block.save()
+        second = etags(2)
+        self.assertNotEqual(second[3], first[3])
+        self.assertEqual(second[4], first[4])
+
+    def test_lesson_start(self):
+        # The outer transaction adds a savepoint and its release under TestCase.
+        with self.assertQueryBudget(9):
+            response = self.client.post(self.lesson_url(suffix="start/", chapter=self.last_chapter), **self.auth())
+        self.assertEqual(response.status_code, 200)
+
+    def test_lesson_complete(self):
+        with self.assertQueryBudget(10):
+            response = self.client.post(self.lesson_url(suffix="complete/", chapter=self.last_chapter), **self.auth())
+        self.assertEqual(response.status_code, 200)
+
+    def test_progress_batch(self):
+        events = [
+            {"course_slug": self.course.slug, "chapter_slug": chapter.slug, "number": number, "event": "complete"}
+            for chapter in self.course.chapters.all()
+            for number in range(1, LESSONS_PER_CHAPTER + 1)
+        ]
+        with self.assertQueryBudget(8):
+            response = self.client.post(
+                "/api/courses/progress/batch/", json.dumps(events), content_type="application/json", **self.auth()
+            )
+        self.assertEqual({r["status"] for r in response.json()["results"]}, {"ok"})
+
+    def test_last_incomplete(self):
+        with self.assertQueryBudget(2):
+            self.client.get("/api/courses/progress/last-incomplete/", **self.auth())
+
+    def test_my_courses(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get("/api/courses/progress/my-courses/", **self.auth())
+        self.assertEqual(len(response.json()), 1)
+
+    def test_course_progress(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get(f"/api/courses/{self.course.slug}/progress/", **self.auth())
+        self.assertEqual(response.json()["completed"], 10)
+
+    def test_course_progress_follows_lessons(self):
+        path = f"/api/courses/{self.course.slug}/progress/"
+        total = Lesson.objects.filter(course=self.course).count()
+        Lesson.objects.create(chapter=self.last_chapter, title="Bonus", number=LESSONS_PER_CHAPTER + 1)
+        self.assertEqual(self.client.get(path, **self.auth()).json()["total"], total + 1)
+        Lesson.objects.filter(course=self.course, number__gt=1).delete()
+        response = self.client.get(path, **self.auth()).json()
+        self.assertEqual(response["total"], CHAPTERS_PER_COURSE)
+        self.assertLessEqual(response["percentage"], 100)
+
+    def test_lessons_renumber_once_per_change(self):
+        with mock.patch.object(Lesson, "renumber", wraps=Lesson.renumber) as renumber:
+            lesson = Lesson.objects.get(chapter=self.chapter, number=2)
+            lesson.title = "Renamed"
+            lesson.save()
+            self.assertEqual(renumber.call_count, 0)
+            self.chapter.delete()
+            self.assertEqual(renumber.call_count, 1)
+            Lesson.objects.filter(chapter=self.last_chapter).delete()
+            self.assertEqual(renumber.call_count, 2)
+            self.courses[1].delete()
+            self.assertEqual(renumber.call_count, 2)
+        positions = list(Lesson.objects.filter(course=self.course).values_list("course_position", flat=True))
+        self.assertEqual(sorted(positions), list(range(1, (CHAPTERS_PER_COURSE - 2) * LESSONS_PER_CHAPTER + 1)))
+
+    def test_next_lesson(self):
+        with self.assertQueryBudget(3):
+            response = self.client.get(f"/api/courses/{self.course.slug}/next-lesson/", **self.auth())
+        self.assertEqual(response.json()["number"], 5)
+
+    def test_lesson_statuses(self):
+        with self.assertQueryBudget(4):
+            response = self.client.get(f"/api/courses/{self.course.slug}/lesson-statuses/", **self.auth())
+        self.assertEqual(len(response.json()["lesson_statuses"]), CHAPTERS_PER_COURSE * LESSONS_PER_CHAPTER)
+
+    def test_dashboard(self):
+        with self.assertQueryBudget(1 + CourseDashboardView.QUERY_BUDGET):
+            response = self.client.get(f"/api/courses/{self.course.slug}/dashboard/", **self.auth())
+        body = response.json()
+        self.assertTrue(body["has_access"])
+        self.assertEqual(body["progress"]["completed"], 10)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AsyncReadViewTests(CatalogDataMixin, TestCase):
+    """``courses.views_async`` must answer exactly like the DRF views it replaces under ASGI."""
+
+    def get_async(self, view, path, user=None, **kwargs):
+        request = RequestFactory().get(path, **(self.auth(user) if user else {}))
+        return async_to_sync(view)(request, **kwargs)
+
+    def assertMatchesSync(self, view, path, user=None, **kwargs):
+        expected = self.client.get(path, **(self.auth(user) if user else {}))
+        cache.clear()
+        response = self.get_async(view, path, user, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+
+    def test_course_list(self):
+        self.assertMatchesSync(views_async.course_list, "/api/courses/")
+        self.assertMatchesSync(views_async.course_list, "/api/courses/?fields=title,slug&depth=chapter")
+        self.assertMatchesSync(views_async.course_list, "/api/courses/?page_size=2")
+        self.assertMatchesSync(views_async.course_list, "/api/courses/?cursor=bogus")
+        self.assertMatchesSync(views_async.course_list, "/api/courses/?cursor=W251bGwsIDFd")
+
+    def test_course_detail(self):
+        self.assertMatchesSync(views_async.course_detail, f"/api/courses/{self.course.slug}/", slug=self.course.slug)
+        self.assertMatchesSync(views_async.course_detail, "/api/courses/missing/", slug="missing")
+
+    def test_lesson_by_number(self):
+        for number, user in [(1, None), (2, None), (2, self.others[0]), (2, self.learner)]:
+            with self.subTest(number=number, user=user):
+                self.assertMatchesSync(
+                    views_async.lesson_by_number, self.lesson_url(number=number), user,
+                    course_slug=self.course.slug, chapter_slug=self.chapter.slug, number=number,
+                )
+
+    def test_lesson_by_number_refuses_inactive_user(self):
+        User.objects.filter(pk=self.others[1].pk).update(is_active=False)
+        self.assertMatchesSync(
+            views_async.lesson_by_number, self.lesson_url(), self.others[1],
+            course_slug=self.course.slug, chapter_slug=self.chapter.slug, number=2,
+        )
+
+    def test_lesson_by_number_query_budget(self):
+        self.get_async(
+            views_async.lesson_by_number, self.lesson_url(), self.learner,
+            course_slug=self.course.slug, chapter_slug=self.chapter.slug, number=2,
+        )
+        # Same as the DRF view: user, lesson, blocks, neighbours.
+        with self.assertQueryBudget(4):
+            self.get_async(
+                views_async.lesson_by_number, self.lesson_url(), self.learner,
+                course_slug=self.course.slug, chapter_slug=self.chapter.slug, number=2,
+            )
+
+    def test_course_progress(self):
+        path = f"/api/courses/{self.course.slug}/progress/"
+        for user in [None, self.learner, self.others[0]]:
+            with self.subTest(user=user):
+                self.assertMatchesSync(views_async.course_progress, path, user, course_slug=self.course.slug)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class CompressedResponseTests(CatalogDataMixin, TestCase):
+    """Snapshot responses are compressed once per encoding and content version."""
+
+    def test_gzip_matches_identity(self):
+        identity = self.client.get("/api/courses/")
+        response = self.client.get("/api/courses/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+
+    def test_each_encoding_is_compressed_once(self):
+        with mock.patch("courses.compression.gzip.compress", wraps=gzip.compress) as compress:
+            for _ in range(3):
+                self.client.get("/api/courses/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compress.call_count, 1)
+
+    def test_small_bodies_are_not_encoded(self):
+        response = self.client.get("/api/courses/?fields=slug", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(len(response.json()["results"]), COURSES)
+
+    def test_accepted_encoding(self):
+        for header, expected in [("", ""), ("gzip;q=0", ""), ("identity, gzip;q=0.5", "gzip"), ("*", "")]:
+            with self.subTest(header=header):
+                request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(compression.accepted_encoding(request), expected)
+
+    def test_lesson_statuses_follow_progress(self):
+        path = f"/api/courses/{self.course.slug}/lesson-statuses/"
+        before = self.client.get(path, **self.auth()).json()
+        self.assertEqual(sum(s["is_completed"] for s in before["lesson_statuses"]), 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.lesson_url(suffix="complete/", chapter=self.last_chapter), **self.auth())
+        after = self.client.get(path, **self.auth()).json()
+        self.assertEqual(sum(s["is_completed"] for s in after["lesson_statuses"]), 11)
+
+    def test_lesson_statuses_missing_course(self):
+        response = self.client.get("/api/courses/missing/lesson-statuses/", **self.auth())
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"detail": "Course not found"})
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class KeysetPaginationTests(CatalogDataMixin, TestCase):
+    def walk(self, path, budget, **extra):
+        """Follow ``next`` links from ``path``, asserting every page stays within ``budget`` queries."""
+        results = []
+        while path:
+            with self.assertQueryBudget(budget):
+                body = self.client.get(path, **extra).json()
+            results += body["results"]
+            path = body["next"]
+        return results
+
+    def test_course_pages(self):
+        slugs = [course["slug"] for course in self.walk("/api/courses/?page_size=1&depth=course", 2)]
+        self.assertEqual(slugs, list(Course.objects.order_by("title", "id").values_list("slug", flat=True)))
+
+    def test_course_titles_tie(self):
+        Course.objects.update(title="Same title")
+        slugs = [course["slug"] for course in self.walk("/api/courses/?page_size=2&depth=course", 2)]
+        self.assertEqual(slugs, list(Course.objects.order_by("id").values_list("slug", flat=True)))
+
+    def test_progress_history(self):
+        # Rows written by one batch share a started_at, so ties are resolved by id.
+        LessonProgress.objects.filter(user=self.learner).update(started_at=self.course.created_at)
+        ids = [row["id"] for row in self.walk("/api/courses/progress/history/?page_size=3", 2, **self.auth())]
+        expected = LessonProgress.objects.filter(user=self.learner).order_by("-started_at", "id")
+        self.assertEqual(ids, list(expected.values_list("id", flat=True)))
+
+    def test_page_size_is_bounded(self):
+        paginator = CoursePagination()
+        for query, expected in [("", 50), ("page_size=0", 1), ("page_size=10000", 100), ("page_size=x", 50)]:
+            with self.subTest(query=query):
+                self.assertEqual(paginator.get_page_size(RequestFactory().get(f"/?{query}")), expected)
+
+    def test_invalid_cursor(self):
+        # Garbage, one value, a date that is not one, then [null, 1], [[1], 1] and ["x", {}].
+        cursors = ["bogus", "WzFd", "WyJub3QtYS1kYXRlIiwgMV0=", "W251bGwsIDFd", "W1sxXSwgMV0=", "WyJ4Iiwge31d"]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/api/courses/progress/history/?cursor={cursor}", **self.auth())
+                self.assertEqual(response.status_code, 404)
+        for cursor in ["bogus", "W251bGwsIDFd", "W1sxXSwgMV0=", "WyJ4Iiwge31d"]:
+            with self.subTest(cursor=cursor), self.assertNumQueries(0):
+                # Refused before the snapshot cache is consulted or filled.
+                self.assertEqual(self.client.get(f"/api/courses/?cursor={cursor}").status_code, 404)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ConditionalGetTests(CatalogDataMixin, TestCase):
+    """Content endpoints answer a matching ``If-None-Match``/``If-Modified-Since`` with a 304."""
+
+    def test_lesson_not_modified(self):
+        response = self.client.get(self.lesson_url(), **self.auth())
+        self.assertIn("private", response["Cache-Control"])
+        # User, lesson with its validators, neighbours: no blocks and no serialization.
+        with self.assertQueryBudget(3):
+            revisit = self.client.get(self.lesson_url(), HTTP_IF_NONE_MATCH=response["ETag"], **self.auth())
+        self.assertEqual(revisit.status_code, 304)
+        self.assertEqual(revisit.content, b"")
+        revisit = self.client.get(self.lesson_url(), HTTP_IF_MODIFIED_SINCE=response["Last-Modified"], **self.auth())
+        self.assertEqual(revisit.status_code, 304)
+
+    def test_lesson_validators_follow_blocks(self):
+        etag = self.client.get(self.lesson_url(), **self.auth())["ETag"]
+        LessonBlock.objects.filter(lesson__chapter=self.chapter, lesson__number=2).first().delete()
+        response = self.client.get(self.lesson_url(), HTTP_IF_NONE_MATCH=etag, **self.auth())
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["blocks"]), BLOCKS_PER_LESSON - 1)
+
+    def test_lesson_validators_follow_fields(self):
+        etag = self.client.get(self.lesson_url(), **self.auth())["ETag"]
+        response = self.client.get(self.lesson_url(suffix="?fields=title"), HTTP_IF_NONE_MATCH=etag, **self.auth())
+        self.assertEqual(response.status_code, 200)
+
+    def test_gated_lesson_is_checked_first(self):
+        etag = self.client.get(self.lesson_url(), **self.auth())["ETag"]
+        response = self.client.get(self.lesson_url(), HTTP_IF_NONE_MATCH=etag, **self.auth(self.others[0]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_bundle_etags_match_lesson(self):
+        bundle = self.client.get(self.lesson_url(suffix="bundle/"), **self.auth()).json()["lessons"]
+        for entry in bundle:
+            with self.subTest(number=entry["number"]):
+                response = self.client.get(self.lesson_url(number=entry["number"]), **self.auth())
+                self.assertEqual(response["ETag"], entry["etag"])
+
+    def test_course_detail_not_modified(self):
+        path = f"/api/courses/{self.course.slug}/"
+        etag = self.client.get(path)["ETag"]
+        with self.assertQueryBudget(0):
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chapter.save()
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_chapter_not_modified(self):
+        Chapter.objects.filter(pk=self.chapter.pk).update(slug="unique-chapter")
+        view = ChapterDetailView.as_view()
+        response = view(RequestFactory().get("/"), slug="unique-chapter")
+        self.assertEqual(len(response.data["lessons"]), LESSONS_PER_CHAPTER)
+        revisit = view(RequestFactory().get("/", HTTP_IF_NONE_MATCH=response["ETag"]), slug="unique-chapter")
+        self.assertEqual(revisit.status_code, 304)
+        self.assertEqual(revisit["Last-Modified"], response["Last-Modified"])
+
+    def test_async_views(self):
+        etag = self.client.get(self.lesson_url(), **self.auth())["ETag"]
+        request = RequestFactory().get(self.lesson_url(), HTTP_IF_NONE_MATCH=etag, **self.auth())
+        response = async_to_sync(views_async.lesson_by_number)(
+            request, course_slug=self.course.slug, chapter_slug=self.chapter.slug, number=2
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class CourseTreeTests(CatalogDataMixin, TestCase):
+    """``courses.tree`` must render exactly what the nested serializers render."""
+
+    QUERIES = [
+        "",
+        "depth=chapter",
+        "depth=lesson&render=html",
+        "fields=title,slug,image_url,image_srcset,price_eur",
+        "fields=title,chapters&fields[chapter]=slug",
+        "fields[lesson]=title,number,blocks&fields[block]=text_html,links&render=html",
+    ]
+
+    def test_matches_serializers(self):
+        Course.objects.filter(pk=self.course.pk).update(
+            image="course_images/lens.jpg",
+            image_variants=[{"name": "course_images/variants/lens.320w.0123456789ab.webp", "width": 320, "format": "webp"}],
+        )
+        request = RequestFactory().get("/api/courses/")
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                params = parse_sparse_params(QueryDict(query), "course")
+                context = {"request": request, **params}
+                path = prefetch_path("course", params["depth"])
+                courses = Course.objects.prefetch_related(path) if path else Course.objects.all()
+                expected = JSONRenderer().render(CourseSerializer(courses, many=True, context=context).data)
+                self.assertEqual(JSONRenderer().render(course_tree(Course.objects.all(), context)), expected)
+
+
+class RenderedMarkdownTests(CatalogDataMixin, TestCase):
+    def test_markdown_is_rendered_and_sanitized_on_save(self):
+        block = LessonBlock.objects.filter(lesson__chapter=self.chapter).first()
+        block.text_markdown = "**Aperture** <script>alert(1)</script> [f-stops](https://example.com)"
+        block.save(update_fields=["text_markdown"])
+        block.refresh_from_db()
+        self.assertIn("<strong>Aperture</strong>", block.rendered_html)
+        self.assertNotIn("<script", block.rendered_html)
+        self.assertIn('rel="noopener noreferrer"', block.rendered_html)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).rendered_html, "<h1>Intro</h1>")
+
+    def test_backfill_command(self):
+        # The catalog's blocks were bulk-created, so nothing rendered them yet.
+        self.assertFalse(LessonBlock.objects.exclude(rendered_html="").exists())
+        out = StringIO()
+        call_command("render_markdown", stdout=out)
+        self.assertIn(f"Rendered {LessonBlock.objects.count()} Markdown fields.", out.getvalue())
+        self.assertFalse(LessonBlock.objects.filter(rendered_html="").exists())
+
+    def test_migration_backfills_existing_content(self):
+        migration = import_module("courses.migrations.0010_backfill_rendered_html")
+        Course.objects.update(rendered_html="")
+        migration.render_existing_markdown(django_apps, None)
+        self.assertFalse(LessonBlock.objects.filter(rendered_html="").exists())
+        self.assertEqual(Course.objects.get(pk=self.course.pk).rendered_html, "<h1>Intro</h1>")
+
+    def test_render_html_param(self):
+        call_command("render_markdown", stdout=StringIO())
+        course = self.client.get(f"/api/courses/{self.course.slug}/?render=html").json()
+        self.assertEqual(course["description_html"], "<h1>Intro</h1>")
+        self.assertNotIn("description_markdown", course)
+        block = course["chapters"][0]["lessons"][0]["blocks"][0]
+        self.assertTrue(block["text_html"].startswith("<p>Text"))
+        self.assertNotIn("text_markdown", block)
+
+        course = self.client.get(f"/api/courses/{self.course.slug}/").json()
+        self.assertNotIn("description_html", course)
+        self.assertEqual(self.client.get("/api/courses/?render=pdf").status_code, 400)
+
+    def test_unknown_fields_are_refused(self):
+        self.assertEqual(self.client.get("/api/courses/?fields=title,bogus").status_code, 400)
+        self.assertEqual(self.client.get(f"/api/courses/{self.course.slug}/?fields[block]=x1").status_code, 400)
+        self.assertEqual(self.client.get(f"{self.lesson_url(number=1)}?fields=title,next").status_code, 200)
+
+
+class ImageVariantTests(CatalogDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root, COURSE_IMAGE_WIDTHS=[320, 640], COURSE_IMAGE_FORMATS=["webp", "jpeg"])
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, course, width=800, height=500):
+        buffer = BytesIO()
+        Image.new("RGBA", (width, height), (200, 80, 20, 255)).save(buffer, format="PNG")
+        form = mock.Mock(changed_data=["image"])
+        course.image = SimpleUploadedFile("lens.png", buffer.getvalue(), content_type="image/png")
+        with self.captureOnCommitCallbacks(execute=True):
+            CourseAdmin(Course, admin.site).save_model(mock.Mock(), course, form, change=True)
+
+    def test_admin_upload_queues_variants(self):
+        self.upload(self.course)
+        self.assertEqual(Course.objects.get(pk=self.course.pk).image_variants, [])
+        self.assertEqual(run_pending(), 1)
+
+        variants = Course.objects.get(pk=self.course.pk).image_variants
+        self.assertEqual([(v["format"], v["width"]) for v in variants],
+                         [("webp", 320), ("webp", 640), ("webp", 800), ("jpeg", 320), ("jpeg", 640), ("jpeg", 800)])
+        for variant in variants:
+            self.assertRegex(variant["name"], r"^course_images/variants/lens\w*\.\d+w\.[0-9a-f]{12}\.(webp|jpg)$")
+            with default_storage.open(variant["name"]) as fh:
+                self.assertEqual(Image.open(fh).width, variant["width"])
+
+        srcset = self.client.get(f"/api/courses/{self.course.slug}/?depth=course").json()["image_srcset"]
+        self.assertEqual(srcset[0]["type"], "image/webp")
+        self.assertTrue(srcset[0]["url"].startswith("http://testserver/media/course_images/variants/"))
+
+    def test_replaced_image_skips_stale_job(self):
+        self.upload(self.course)
+        self.upload(self.course, width=300, height=200)
+        self.assertEqual(run_pending(), 2)
+        variants = Course.objects.get(pk=self.course.pk).image_variants
+        self.assertEqual([v["width"] for v in variants], [300, 300])
+
+
+@skipUnless(connection.vendor == "postgresql", "query plans are only checked on PostgreSQL")
+class QueryPlanTests(CatalogDataMixin, TestCase):
+    """
+    EXPLAIN the hot lookups with sequential scans disabled: the planner still picks one when no
+    index can serve the query, so this catches missing indexes even on a small test dataset.
+    Set ``QUERY_PLAN_DIR`` to keep the captured plans.
+    """
+
+    def assertUsesIndexes(self, name, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        if os.environ.get("QUERY_PLAN_DIR"):
+            with open(os.path.join(os.environ["QUERY_PLAN_DIR"], f"{name}.txt"), "w") as fh:
+                fh.write(plan)
+        for table in LARGE_TABLES:
+            self.assertNotIn(f"Seq Scan on {table}", plan, f"{name} scans {table}:\n{plan}")
+
+    def test_lesson_by_slug_and_number(self):
+        self.assertUsesIndexes(
+            "lesson_lookup",
+            Lesson.objects.filter(course__slug=self.course.slug, chapter__slug=self.chapter.slug, number=2),
+        )
+
+    def test_course_lessons_in_order(self):
+        self.assertUsesIndexes("course_lessons", Lesson.objects.filter(course=self.course).order_by("course_position"))
+
+    def test_completed_progress(self):
+        self.assertUsesIndexes(
+            "completed_progress",
+            LessonProgress.objects.filter(user=self.learner, lesson__course=self.course, completed_at__isnull=False),
+        )
+
+    def test_last_incomplete_progress(self):
+        self.assertUsesIndexes(
+            "last_incomplete",
+            LessonProgress.objects.filter(user=self.learner, completed_at__isnull=True).order_by("-started_at"),
+        )
+
+    def test_progress_history_page(self):
+        paginator = ProgressHistoryPagination()
+        cursor = paginator.encode_cursor(LessonProgress.objects.filter(user=self.learner).first())
+        request = RequestFactory().get("/", {"cursor": cursor})
+        self.assertUsesIndexes(
+            "progress_history_page",
+            paginator.page_queryset(LessonProgress.objects.filter(user=self.learner), request),
+        )
+
+    def test_user_by_email(self):
+        self.assertUsesIndexes("user_by_email", User.objects.filter(email_normalized="learner@example.com"))
+
+    def test_purchase_exists(self):
+        self.assertUsesIndexes(
+            "purchase_exists",
+            CoursePurchase.objects.filter(user=self.learner, course=self.course).values("id")[:1],
+        )
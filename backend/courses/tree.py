@@ -0,0 +1,117 @@
+"""
+The nested course JSON built from ``.values()`` rows instead of model instances and nested serializers.
+
+``CourseSerializer`` instantiates a model and runs DRF field machinery for every chapter, lesson
+and block, so a catalog's CPU time grows with its block count. ``CourseTree`` reads each level
+with one ``.values()`` query, groups the rows by parent ID in a single pass and emits plain dicts.
+The field lists come from the serializers themselves, so every ``depth``/``fields``/``render``
+selection produces the same JSON, byte for byte (see ``courses.tests.CourseTreeTests``).
+"""
+from operator import itemgetter
+
+from rest_framework import serializers
+
+from .models import Chapter, Lesson, LessonBlock
+from .serializers import (
+    CHILD_FIELDS,
+    LEVELS,
+    ChapterSerializer,
+    CourseSerializer,
+    LessonBlockSerializer,
+    LessonSerializer,
+    image_srcset,
+    image_url,
+)
+
+SERIALIZERS = {"course": CourseSerializer, "chapter": ChapterSerializer, "lesson": LessonSerializer, "block": LessonBlockSerializer}
+# Column holding each level's parent ID, used to group rows under their parent.
+PARENT_COLUMNS = {"chapter": "course_id", "lesson": "chapter_id", "block": "lesson_id"}
+# Serializer fields whose column has another name.
+SOURCES = {"description_html": "rendered_html", "text_html": "rendered_html"}
+
+_price = serializers.DecimalField(max_digits=10, decimal_places=2, coerce_to_string=False)
+
+
+class CourseTree:
+    """
+    Serialize the courses in ``courses`` (a ``Course`` queryset) for a serializer ``context``
+    holding ``request`` and the parsed sparse parameters. Fetch the rows of ``querysets`` (sync
+    or async), then pass them to ``build``; ``course_tree`` does both synchronously.
+    """
+
+    def __init__(self, courses, context):
+        self.request = context.get("request")
+        levels = LEVELS[:LEVELS.index(context["depth"]) + 1]
+        self.fields = {level: list(SERIALIZERS[level](context=context).fields) for level in levels}
+        # Children are selected through a subquery, so the queries do not depend on each other's results.
+        course_ids = courses.values("id")
+        self.querysets = [courses.values(*self._columns("course"))]
+        if "chapter" in self.fields:
+            self.querysets.append(Chapter.objects.filter(course_id__in=course_ids).values(*self._columns("chapter")))
+        if "lesson" in self.fields:
+            self.querysets.append(Lesson.objects.filter(course_id__in=course_ids).values(*self._columns("lesson")))
+        if "block" in self.fields:
+            self.querysets.append(
+                LessonBlock.objects.filter(lesson__course_id__in=course_ids).values(*self._columns("block"))
+            )
+
+    def _columns(self, level) -> list:
+        columns = {"id"}
+        if level in PARENT_COLUMNS:
+            columns.add(PARENT_COLUMNS[level])
+        for name in self.fields[level]:
+            if name == "image_url":
+                columns.add("image")
+            elif name == "image_srcset":
+                columns.add("image_variants")
+            elif name != CHILD_FIELDS.get(level):
+                columns.add(SOURCES.get(name, name))
+        return sorted(columns)
+
+    def _getters(self, level) -> list:
+        getters = []
+        for name in self.fields[level]:
+            if name == CHILD_FIELDS.get(level):
+                getters.append((name, None))
+            elif name == "image_url":
+                getters.append((name, lambda row: image_url(row["image"], self.request)))
+            elif name == "image_srcset":
+                getters.append((name, lambda row: image_srcset(row["image_variants"], self.request)))
+            elif name == "price_eur":
+                getters.append((name, lambda row: _price.to_representation(row["price_eur"])))
+            else:
+                getters.append((name, itemgetter(SOURCES.get(name, name))))
+        return getters
+
+    def build(self, rows) -> list:
+        """The course dicts, given the rows of each queryset in ``querysets``, in the same order."""
+        levels = list(self.fields)
+        children = {}  # parent ID -> serialized children, from the level below
+        for level, level_rows in reversed(list(zip(levels, rows))):
+            getters = self._getters(level)
+            parent = PARENT_COLUMNS.get(level)
+            grouped = {}
+            for row in level_rows:
+                item = {
+                    name: children.get(row["id"], []) if getter is None else getter(row)
+                    for name, getter in getters
+                }
+                if parent is None:
+                    grouped.setdefault(None, []).append(item)
+                else:
+                    grouped.setdefault(row[parent], []).append(item)
+            children = grouped
+        return children.get(None, [])
+
+
+def course_tree(courses, context) -> list:
+    tree = CourseTree(courses, context)
+    return tree.build([list(queryset) for queryset in tree.querysets])
+
+
+async def acourse_tree(courses, context) -> list:
+    tree = CourseTree(courses, context)
+    rows = []
+    for queryset in tree.querysets:
+        rows.append([row async for row in queryset])
+    return tree.build(rows)
@@ -1,27 +1,51 @@
+from django.conf import settings
 from django.urls import path
+from . import views_async
 from .views import (
     CourseListView,
     CourseDetailView,
     ChapterDetailView,
     LessonByNumberView,
+    LessonBundleView,
     LessonStartView,
     LessonCompleteView,
+    ProgressBatchView,
     LastIncompleteLessonView,
     CourseProgressView,
+    MyCoursesProgressView,
+    ProgressHistoryView,
     NextAvailableLessonView,
     LessonCompletionStatusView,
+    CourseDashboardView,
 )
 
+if settings.ASYNC_VIEWS:
+    # ASGI profile: the hot read endpoints never take a thread (see courses.views_async).
+    course_list = views_async.course_list
+    course_detail = views_async.course_detail
+    lesson_by_number = views_async.lesson_by_number
+    course_progress = views_async.course_progress
+else:
+    course_list = CourseListView.as_view()
+    course_detail = CourseDetailView.as_view()
+    lesson_by_number = LessonByNumberView.as_view()
+    course_progress = CourseProgressView.as_view()
+
 urlpatterns = [
-    path('', CourseListView.as_view(), name='course-list'),
-    path('<slug:slug>/', CourseDetailView.as_view(), name='course-detail'),
-    path('<slug:course_slug>/<slug:chapter_slug>/<int:number>/', LessonByNumberView.as_view(), name='lesson-by-number'),
+    path('', course_list, name='course-list'),
+    path('<slug:slug>/', course_detail, name='course-detail'),
+    path('<slug:course_slug>/<slug:chapter_slug>/<int:number>/', lesson_by_number, name='lesson-by-number'),
+    path('<slug:course_slug>/<slug:chapter_slug>/<int:number>/bundle/', LessonBundleView.as_view(), name='lesson-bundle'),
     path('<slug:course_slug>/<slug:chapter_slug>/<int:number>/start/', LessonStartView.as_view(), name='lesson-start'),
     path('<slug:course_slug>/<slug:chapter_slug>/<int:number>/complete/', LessonCompleteView.as_view(), name='lesson-complete'),
     path('progress/last-incomplete/', LastIncompleteLessonView.as_view(), name='last-incomplete'),
-    path('<slug:course_slug>/progress/', CourseProgressView.as_view(), name='course-progress'),
+    path('progress/batch/', ProgressBatchView.as_view(), name='progress-batch'),
+    path('progress/my-courses/', MyCoursesProgressView.as_view(), name='my-courses-progress'),
+    path('progress/history/', ProgressHistoryView.as_view(), name='progress-history'),
+    path('<slug:course_slug>/progress/', course_progress, name='course-progress'),
     path('<slug:course_slug>/next-lesson/', NextAvailableLessonView.as_view(), name='next-lesson'),
     path('<slug:course_slug>/lesson-statuses/', LessonCompletionStatusView.as_view(), name='lesson-statuses'),
+    path('<slug:course_slug>/dashboard/', CourseDashboardView.as_view(), name='course-dashboard'),
 ]
 
 
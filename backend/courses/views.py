@@ -1,55 +1,305 @@
-from rest_framework import generics, permissions
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions, serializers
+from rest_framework.response import Response
+from payments.entitlements import has_course_access_from_token
+from .cache import get_progress_version, get_snapshot, snapshot_key
+from .compression import compressed_json
+from .conditional import not_modified, set_validators, snapshot_etag, validators, with_validators
 from .models import Course, Chapter, Lesson
-from .serializers import CourseSerializer, ChapterSerializer, LessonSerializer
+from .pagination import CoursePagination, ProgressHistoryPagination
+from .serializers import (
+    CourseSerializer,
+    ChapterSerializer,
+    LessonSerializer,
+    ProgressHistorySerializer,
+    parse_sparse_params,
+    prefetch_path,
+    sparse_cache_key,
+)
+from .tree import course_tree
+
+
+def snapshot_response(request, key, build):
+    """
+    The snapshot under ``key`` as precompressed JSON (see ``courses.compression``), or rendered
+    by DRF for any other format, such as the browsable API.
+    """
+    if request.accepted_renderer.format == "json":
+        return compressed_json(request, key, build)
+    return Response(get_snapshot(key, build))
+
+
+class SparseFieldsViewMixin:
+    """
+    Apply ``?depth=`` / ``?fields=`` to the serializer and prefetch only the requested levels. The
+    queryset carries the object's validators (``courses.conditional``); its children are prefetched
+    by ``prefetch_children`` once the response is known not to be a 304.
+    """
+
+    root_level = "course"
+
+    def get_sparse_params(self):
+        if not hasattr(self, "_sparse_params"):
+            self._sparse_params = parse_sparse_params(self.request.query_params, self.root_level)
+        return self._sparse_params
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context.update(self.get_sparse_params())
+        return context
+
+    def get_queryset(self):
+        return with_validators(super().get_queryset(), self.root_level, self.get_sparse_params()["depth"])
 
+    def prefetch_children(self, obj):
+        path = prefetch_path(self.root_level, self.get_sparse_params()["depth"])
+        if path:
+            prefetch_related_objects([obj], path)
 
-class CourseListView(generics.ListAPIView):
-    queryset = Course.objects.all().prefetch_related("chapters__lessons__blocks")
+
+class CourseListView(SparseFieldsViewMixin, generics.ListAPIView):
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CoursePagination
+
+    def list(self, request, *args, **kwargs):
+        # Image URLs are absolute, so the snapshot is per host.
+        key = snapshot_key(
+            "list",
+            sparse_cache_key(self.get_sparse_params()),
+            self.paginator.page_cache_key(request, Course),
+            request.build_absolute_uri("/"),
+        )
+        return snapshot_response(request, key, self.build)
 
+    def build(self):
+        page = self.paginator.paginate_queryset(Course.objects.values("id", "title"), self.request)
+        courses = course_tree(Course.objects.filter(id__in=[row["id"] for row in page]), self.get_serializer_context())
+        return self.paginator.get_paginated_data(courses)
 
-class CourseDetailView(generics.RetrieveAPIView):
-    queryset = Course.objects.all().prefetch_related("chapters__lessons__blocks")
+
+class CourseDetailView(SparseFieldsViewMixin, generics.RetrieveAPIView):
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
     lookup_field = "slug"
     permission_classes = [permissions.AllowAny]
 
+    def retrieve(self, request, *args, **kwargs):
+        key = snapshot_key(
+            "detail", kwargs["slug"], sparse_cache_key(self.get_sparse_params()), request.build_absolute_uri("/")
+        )
+        etag = snapshot_etag(key)
+        if not_modified(request, etag):
+            return set_validators(HttpResponseNotModified(), etag)
+        return set_validators(snapshot_response(request, key, lambda: self.build(kwargs["slug"])), etag)
+
+    def build(self, slug):
+        courses = course_tree(Course.objects.filter(slug=slug), self.get_serializer_context())
+        if not courses:
+            raise Http404(f"No {Course._meta.object_name} matches the given query.")
+        return courses[0]
 
-class ChapterDetailView(generics.RetrieveAPIView):
-    queryset = Chapter.objects.all().prefetch_related("lessons__blocks")
+
+class ChapterDetailView(SparseFieldsViewMixin, generics.RetrieveAPIView):
+    queryset = Chapter.objects.all()
     serializer_class = ChapterSerializer
     lookup_field = "slug"
     permission_classes = [permissions.AllowAny]
+    root_level = "chapter"
+
+    def retrieve(self, request, *args, **kwargs):
+        chapter = self.get_object()
+        etag, last_modified = validators(chapter, self.root_level, self.get_sparse_params())
+        if not_modified(request, etag, last_modified):
+            return set_validators(HttpResponseNotModified(), etag, last_modified)
+        self.prefetch_children(chapter)
+        return set_validators(Response(self.get_serializer(chapter).data), etag, last_modified)
 
 
-class LessonByNumberView(generics.RetrieveAPIView):
+class LessonByNumberView(SparseFieldsViewMixin, generics.RetrieveAPIView):
+    queryset = Lesson.objects.select_related("chapter", "course")
     serializer_class = LessonSerializer
     permission_classes = [permissions.AllowAny]
-
-    def get_queryset(self):
-        return Lesson.objects.select_related("chapter__course").prefetch_related("blocks")
+    root_level = "lesson"
 
     def get_object(self):
         course_slug = self.kwargs["course_slug"]
         chapter_slug = self.kwargs["chapter_slug"]
         number = int(self.kwargs["number"])
-        return (
-            self.get_queryset()
-            .filter(
-                chapter__course__slug=course_slug,
-                chapter__slug=chapter_slug,
-                number=number,
-            )
-            .get()
+        return get_object_or_404(
+            self.get_queryset(),
+            course__slug=course_slug,
+            chapter__slug=chapter_slug,
+            number=number,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lesson = self.get_object()
+        # Entitlements come from the token or the cache, so gating adds no query to the lesson hot path.
+        if not lesson.is_free_preview and not has_course_access_from_token(request, lesson.course_id):
+            self.permission_denied(request, message="Purchase this course to unlock this lesson.")
+        params = self.get_sparse_params()
+        neighbours = lesson_neighbours(lesson) if wants_neighbours(params) else None
+        etag, last_modified = validators(lesson, self.root_level, params, neighbours)
+        # Paid lessons must not be stored by shared caches.
+        private = not lesson.is_free_preview
+        if not_modified(request, etag, last_modified):
+            return set_validators(HttpResponseNotModified(), etag, last_modified, private=private)
+        self.prefetch_children(lesson)
+        data = self.get_serializer(lesson).data
+        if neighbours is not None:
+            data["previous"], data["next"] = neighbours
+        return set_validators(Response(data), etag, last_modified, private=private)
+
+
+class LessonBundleView(SparseFieldsViewMixin, generics.GenericAPIView):
+    """
+    The lesson and the next ``?count=`` lessons in course order, each with its blocks, neighbour
+    links and ``etag``, so clients can prefetch while the learner reads. Lessons the user cannot
+    open are listed with ``locked`` set and no content.
+
+    Query budget (see ``QUERY_BUDGET``): lesson, the lessons in and around the window, blocks, and
+    purchases while the entitlement cache is cold. Authentication may add its own user lookup on top.
+    """
+
+    serializer_class = LessonSerializer
+    permission_classes = [permissions.AllowAny]
+    root_level = "lesson"
+    QUERY_BUDGET = 4
+    DEFAULT_COUNT = 3
+    MAX_COUNT = 10
+
+    def get_count(self) -> int:
+        try:
+            count = int(self.request.query_params.get("count", self.DEFAULT_COUNT))
+        except ValueError:
+            raise serializers.ValidationError({"count": ["A valid integer is required."]})
+        return min(max(count, 0), self.MAX_COUNT)
+
+    def get(self, request, course_slug: str, chapter_slug: str, number: int):
+        count = self.get_count()
+        lesson = get_object_or_404(
+            Lesson.objects.select_related("chapter", "course"),
+            course__slug=course_slug,
+            chapter__slug=chapter_slug,
+            number=number,
         )
+        has_access = has_course_access_from_token(request, lesson.course_id)
+        if not lesson.is_free_preview and not has_access:
+            self.permission_denied(request, message="Purchase this course to unlock this lesson.")
+
+        # One range scan over (course, course_position), one lesson wider either side for the links.
+        position = lesson.course_position
+        window = {
+            row.course_position: row
+            for row in Lesson.objects.filter(
+                course_id=lesson.course_id, course_position__range=(position - 1, position + count + 1)
+            ).select_related("chapter")
+        }
+        window[position] = lesson
+        bundle = [window[p] for p in range(position, position + count + 1) if p in window]
+        unlocked = [row for row in bundle if row.is_free_preview or has_access]
+        path = prefetch_path(self.root_level, self.get_sparse_params()["depth"])
+        if path:
+            prefetch_related_objects(unlocked, path)
+
+        lessons = []
+        for row in bundle:
+            entry = {"chapter_slug": row.chapter.slug, "number": row.number, "locked": row not in unlocked}
+            entry["etag"], entry["lesson"] = (
+                (None, None) if entry["locked"] else self.lesson_payload(lesson.course, row, window, bool(path))
+            )
+            lessons.append(entry)
+        return Response({"course_slug": lesson.course.slug, "lessons": lessons})
+
+    def lesson_payload(self, course, lesson, window, with_blocks: bool):
+        """``(etag, data)`` of ``lesson``, as ``LessonByNumberView`` would serve it."""
+        params = self.get_sparse_params()
+        neighbours = None
+        if wants_neighbours(params):
+            neighbours = tuple(
+                _neighbour_link(course, window.get(position))
+                for position in (lesson.course_position - 1, lesson.course_position + 1)
+            )
+        if with_blocks:
+            # The values with_validators() would have annotated, from the prefetched blocks.
+            blocks = lesson.blocks.all()
+            lesson.blocks_updated_at = max((block.updated_at for block in blocks), default=None)
+            lesson.blocks_count = len(blocks)
+        etag, _ = validators(lesson, self.root_level, params, neighbours)
+        data = self.get_serializer(lesson).data
+        if neighbours is not None:
+            data["previous"], data["next"] = neighbours
+        return etag, data
+
+
+def _neighbour_link(course, lesson):
+    if lesson is None:
+        return None
+    return {
+        "course_slug": course.slug,
+        "chapter_slug": lesson.chapter.slug,
+        "number": lesson.number,
+        "title": lesson.title,
+    }
+
+
+def wants_neighbours(params) -> bool:
+    """Whether the lesson's ``previous``/``next`` links are part of the selected fields."""
+    selected = params["fields"].get("lesson")
+    return not selected or bool({"previous", "next"} & selected)
+
+
+def _neighbour_rows(lesson):
+    position = lesson.course_position
+    return (
+        Lesson.objects.filter(course_id=lesson.course_id, course_position__in=[position - 1, position + 1])
+        .values("course_position", "chapter__slug", "number", "title")
+        .order_by()
+    )
+
+
+def lesson_neighbours(lesson):
+    """Links to the lessons either side of ``lesson`` in course order, from one indexed lookup."""
+    return _links_either_side(lesson, _neighbour_rows(lesson))
+
+
+async def alesson_neighbours(lesson):
+    return _links_either_side(lesson, [row async for row in _neighbour_rows(lesson)])
+
+
+def _links_either_side(lesson, rows):
+    position = lesson.course_position
+    links = {
+        row["course_position"]: {
+            "course_slug": lesson.course.slug,
+            "chapter_slug": row["chapter__slug"],
+            "number": row["number"],
+            "title": row["title"],
+        }
+        for row in rows
+    }
+    return links.get(position - 1), links.get(position + 1)
 
 
 from rest_framework import status
-from rest_framework.response import Response
+from rest_framework.exceptions import NotFound
 from rest_framework.views import APIView
+from django.db import transaction
 from django.utils import timezone
-from .models import LessonProgress, Course
+from .models import LessonProgress, Course, CourseProgressSummary
+from .progress import (
+    MAX_BATCH_EVENTS,
+    course_outline,
+    lesson_statuses,
+    next_lesson,
+    percentage,
+    sync_progress_events,
+    touch_summary,
+)
 
 
 class LessonStartView(APIView):
@@ -57,18 +307,17 @@ class LessonStartView(APIView):
 
     def post(self, request, course_slug: str, chapter_slug: str, number: int):
         try:
-            lesson = (
-                Lesson.objects.select_related("chapter__course")
-                .get(
-                    chapter__course__slug=course_slug,
-                    chapter__slug=chapter_slug,
-                    number=number,
-                )
+            lesson = Lesson.objects.get(
+                course__slug=course_slug,
+                chapter__slug=chapter_slug,
+                number=number,
             )
         except Lesson.DoesNotExist:
             return Response({"detail": "Lesson not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        progress, _ = LessonProgress.objects.get_or_create(user=request.user, lesson=lesson)
+        with transaction.atomic():
+            progress, _ = LessonProgress.objects.get_or_create(user=request.user, lesson=lesson)
+            touch_summary(request.user, lesson.course_id)
         return Response({"status": "started"}, status=status.HTTP_200_OK)
 
 
@@ -77,24 +326,44 @@ class LessonCompleteView(APIView):
 
     def post(self, request, course_slug: str, chapter_slug: str, number: int):
         try:
-            lesson = (
-                Lesson.objects.select_related("chapter__course")
-                .get(
-                    chapter__course__slug=course_slug,
-                    chapter__slug=chapter_slug,
-                    number=number,
-                )
+            lesson = Lesson.objects.get(
+                course__slug=course_slug,
+                chapter__slug=chapter_slug,
+                number=number,
             )
         except Lesson.DoesNotExist:
             return Response({"detail": "Lesson not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        progress, _ = LessonProgress.objects.get_or_create(user=request.user, lesson=lesson)
-        if not progress.completed_at:
-            progress.completed_at = timezone.now()
-            progress.save(update_fields=["completed_at"])
+        with transaction.atomic():
+            progress, _ = LessonProgress.objects.select_for_update().get_or_create(user=request.user, lesson=lesson)
+            newly_completed = not progress.completed_at
+            if newly_completed:
+                progress.completed_at = timezone.now()
+                progress.save(update_fields=["completed_at", "updated_at"])
+            touch_summary(request.user, lesson.course_id, completed_delta=int(newly_completed))
         return Response({"status": "completed"}, status=status.HTTP_200_OK)
 
 
+class ProgressBatchView(APIView):
+    """
+    Replay a list of ``{course_slug, chapter_slug, number, event, timestamp}`` progress events,
+    e.g. after a client reconnects. Returns one ``{index, status}`` result per event.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        events = request.data
+        if not isinstance(events, list):
+            return Response({"detail": "Expected a list of events"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > MAX_BATCH_EVENTS:
+            return Response(
+                {"detail": f"At most {MAX_BATCH_EVENTS} events per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({"results": sync_progress_events(request.user, events)})
+
+
 class LastIncompleteLessonView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -110,7 +379,7 @@ class LastIncompleteLessonView(APIView):
         lesson = progress.lesson
         return Response(
             {
-                "course_slug": lesson.chapter.course.slug,
+                "course_slug": lesson.course.slug,
                 "chapter_slug": lesson.chapter.slug,
                 "number": lesson.number,
                 "title": lesson.title,
@@ -122,30 +391,67 @@ class CourseProgressView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, course_slug: str):
-        try:
-            course = Course.objects.get(slug=course_slug)
-        except Course.DoesNotExist:
-            return Response({"detail": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
+        summary = (
+            CourseProgressSummary.objects.filter(user=request.user, course__slug=course_slug)
+            .only("completed_count", "total_count")
+            .first()
+        )
+        if summary:
+            completed_lessons, total_lessons = summary.completed_count, summary.total_count
+        else:
+            try:
+                course = Course.objects.get(slug=course_slug)
+            except Course.DoesNotExist:
+                return Response({"detail": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
+            total_lessons = Lesson.objects.filter(course=course).count()
+            completed_lessons = LessonProgress.objects.filter(
+                user=request.user,
+                lesson__course=course,
+                completed_at__isnull=False
+            ).count()
 
-        # Get all lessons in the course
-        total_lessons = Lesson.objects.filter(chapter__course=course).count()
-        
-        # Get completed lessons for this user
-        completed_lessons = LessonProgress.objects.filter(
-            user=request.user,
-            lesson__chapter__course=course,
-            completed_at__isnull=False
-        ).count()
-        
-        percentage = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
-        
         return Response({
             "completed": completed_lessons,
             "total": total_lessons,
-            "percentage": round(percentage, 1)
+            "percentage": percentage(completed_lessons, total_lessons)
         })
 
 
+class MyCoursesProgressView(APIView):
+    """Progress for every course the user has started, most recently active first."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        summaries = (
+            CourseProgressSummary.objects.filter(user=request.user)
+            .select_related("course")
+            .order_by("-last_activity")
+        )
+        return Response([
+            {
+                "course_slug": summary.course.slug,
+                "course_title": summary.course.title,
+                "completed": summary.completed_count,
+                "total": summary.total_count,
+                "percentage": percentage(summary.completed_count, summary.total_count),
+                "last_activity": summary.last_activity,
+            }
+            for summary in summaries
+        ])
+
+
+class ProgressHistoryView(generics.ListAPIView):
+    """Every lesson the user has started, most recently started first, a cursor-paginated page at a time."""
+
+    serializer_class = ProgressHistorySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ProgressHistoryPagination
+
+    def get_queryset(self):
+        return LessonProgress.objects.filter(user=self.request.user).select_related("lesson__chapter", "lesson__course")
+
+
 class NextAvailableLessonView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -155,94 +461,90 @@ class NextAvailableLessonView(APIView):
         except Course.DoesNotExist:
             return Response({"detail": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get all lessons in order
-        all_lessons = Lesson.objects.filter(
-            chapter__course=course
-        ).select_related('chapter').order_by('chapter__order_index', 'number')
-
-        # Get completed lessons for this user
-        completed_lessons = LessonProgress.objects.filter(
-            user=request.user,
-            lesson__chapter__course=course,
-            completed_at__isnull=False
-        ).values_list('lesson_id', flat=True)
-
-        # Find the first lesson that is not completed
-        for lesson in all_lessons:
-            if lesson.id not in completed_lessons:
-                return Response({
-                    "course_slug": course.slug,
-                    "chapter_slug": lesson.chapter.slug,
-                    "number": lesson.number,
-                    "title": lesson.title,
-                    "is_free_preview": lesson.is_free_preview
-                })
-
-        # If all lessons are completed, return the last lesson
-        if all_lessons.exists():
-            last_lesson = all_lessons.last()
-            return Response({
-                "course_slug": course.slug,
-                "chapter_slug": last_lesson.chapter.slug,
-                "number": last_lesson.number,
-                "title": last_lesson.title,
-                "is_free_preview": last_lesson.is_free_preview,
-                "all_completed": True
-            })
-
-        return Response({"detail": "No lessons found"}, status=status.HTTP_404_NOT_FOUND)
+        course_lessons = Lesson.objects.filter(course=course).select_related("chapter")
+        completed = LessonProgress.objects.filter(user=request.user, completed_at__isnull=False).values("lesson_id")
+        # One range scan over (course, course_position), skipping completed lessons.
+        lesson = course_lessons.exclude(id__in=completed).order_by("course_position").first()
+        all_completed = lesson is None
+        if all_completed:
+            lesson = course_lessons.order_by("-course_position").first()
+        if lesson is None:
+            return Response({"detail": "No lessons found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_lesson_payload(course, lesson, all_completed))
 
 
 class LessonCompletionStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    def get(self, request, course_slug: str):
+        # Progress changes bump the user's version, course edits the content version in the key.
+        key = snapshot_key("lesson-statuses", course_slug, request.user.pk, get_progress_version(request.user.pk))
+        return snapshot_response(request, key, lambda: self.build(course_slug))
+
+    def build(self, course_slug):
+        try:
+            course = Course.objects.get(slug=course_slug)
+        except Course.DoesNotExist:
+            raise NotFound("Course not found")
+
+        lessons, completed_ids = course_outline(course, self.request.user)
+        upcoming = next_lesson(lessons, completed_ids)
+        return {
+            "course_slug": course.slug,
+            "lesson_statuses": lesson_statuses(lessons, completed_ids, upcoming),
+            "next_lesson": {"chapter_slug": upcoming.chapter.slug, "number": upcoming.number} if upcoming else None
+        }
+
+
+class CourseDashboardView(APIView):
+    """
+    Everything the course page needs in one request: access, progress, next lesson and
+    per-lesson statuses, replacing check-access, progress, next-lesson and lesson-statuses.
+
+    Query budget (see ``QUERY_BUDGET``): course, purchases (skipped while the entitlement cache
+    is warm), lessons, completed lessons. Authentication may add its own user lookup on top.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    QUERY_BUDGET = 4
+
     def get(self, request, course_slug: str):
         try:
             course = Course.objects.get(slug=course_slug)
         except Course.DoesNotExist:
             return Response({"detail": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get all lessons in order
-        all_lessons = Lesson.objects.filter(
-            chapter__course=course
-        ).select_related('chapter').order_by('chapter__order_index', 'number')
-
-        # Get completed lesson IDs for this user
-        completed_lessons = LessonProgress.objects.filter(
-            user=request.user,
-            lesson__chapter__course=course,
-            completed_at__isnull=False
-        ).values_list('lesson_id', flat=True)
-
-        # Get next available lesson
-        next_lesson = None
-        for lesson in all_lessons:
-            if lesson.id not in completed_lessons:
-                next_lesson = {
-                    "chapter_slug": lesson.chapter.slug,
-                    "number": lesson.number
-                }
-                break
-
-        # Build completion status for each lesson
-        lesson_statuses = []
-        for lesson in all_lessons:
-            is_completed = lesson.id in completed_lessons
-            is_next = next_lesson and next_lesson["chapter_slug"] == lesson.chapter.slug and next_lesson["number"] == lesson.number
-            
-            lesson_statuses.append({
-                "lesson_id": lesson.id,
-                "chapter_slug": lesson.chapter.slug,
-                "number": lesson.number,
-                "title": lesson.title,
-                "is_completed": is_completed,
-                "is_next": is_next,
-                "is_free_preview": lesson.is_free_preview
-            })
-
+        has_access = has_course_access_from_token(request, course.id)
+        lessons, completed_ids = course_outline(course, request.user)
+        upcoming = next_lesson(lessons, completed_ids)
+        completed = len(completed_ids)
         return Response({
             "course_slug": course.slug,
-            "lesson_statuses": lesson_statuses,
-            "next_lesson": next_lesson
+            "has_access": has_access,
+            "progress": {
+                "completed": completed,
+                "total": len(lessons),
+                "percentage": percentage(completed, len(lessons)),
+            },
+            "next_lesson": _next_lesson_payload(course, lessons, completed_ids) if lessons else None,
+            "lesson_statuses": lesson_statuses(lessons, completed_ids, upcoming),
         })
 
+
+def _next_lesson_payload(course, lessons, completed_ids) -> dict:
+    upcoming = next_lesson(lessons, completed_ids)
+    # If all lessons are completed, point at the last lesson
+    return _lesson_payload(course, upcoming or lessons[-1], all_completed=upcoming is None)
+
+
+def _lesson_payload(course, lesson, all_completed: bool) -> dict:
+    payload = {
+        "course_slug": course.slug,
+        "chapter_slug": lesson.chapter.slug,
+        "number": lesson.number,
+        "title": lesson.title,
+        "is_free_preview": lesson.is_free_preview
+    }
+    if all_completed:
+        payload["all_completed"] = True
+    return payload
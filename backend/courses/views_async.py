@@ -0,0 +1,152 @@
+"""
+Async versions of the course read endpoints, routed instead of the DRF views in ``courses.views``
+when ``ASYNC_VIEWS`` is on (the ASGI profile, ``config/gunicorn_asgi.py``).
+
+They return the same JSON from the same snapshot and entitlement caches, but await the cache
+and the database through Django's async APIs instead of holding a worker thread per request.
+"""
+import functools
+
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import aprefetch_related_objects
+from django.http import Http404, HttpResponseNotModified, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_safe
+from rest_framework import exceptions
+from rest_framework.utils.encoders import JSONEncoder
+
+from payments.authentication import CachedJWTAuthentication
+from payments.entitlements import ahas_course_access_from_token
+from .cache import asnapshot_key
+from .compression import acompressed_json
+from .conditional import not_modified, set_validators, snapshot_etag, validators, with_validators
+from .models import Course, CourseProgressSummary, Lesson, LessonProgress
+from .pagination import CoursePagination
+from .progress import percentage
+from .serializers import LessonSerializer, parse_sparse_params, prefetch_path, sparse_cache_key
+from .tree import acourse_tree
+from .views import alesson_neighbours, wants_neighbours
+
+_authenticator = CachedJWTAuthentication()
+
+
+def _response(data, status=200, headers=None):
+    # DRF's encoder and compact output, so the body matches what the DRF views render.
+    return JsonResponse(
+        data, status=status, headers=headers, encoder=JSONEncoder, safe=False,
+        json_dumps_params={"ensure_ascii": False, "separators": (",", ":")},
+    )
+
+
+def api_view(view):
+    """
+    Authenticate the bearer token like ``CachedJWTAuthentication`` does for the DRF views, and turn
+    ``APIException`` and ``Http404`` into the responses DRF's exception handler would send.
+    """
+
+    @require_safe
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user_auth = await _authenticator.aauthenticate(request)
+            request.user, request.auth = user_auth or (AnonymousUser(), None)
+            return await view(request, *args, **kwargs)
+        except Http404 as exc:
+            return _error(exceptions.NotFound(*exc.args))
+        except exceptions.APIException as exc:
+            return _error(exc)
+
+    return wrapper
+
+
+def _error(exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    headers = None
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        headers = {"WWW-Authenticate": _authenticator.authenticate_header(None)}
+    return _response(data, status=exc.status_code, headers=headers)
+
+
+@api_view
+async def course_list(request):
+    params = parse_sparse_params(request.GET, "course")
+    paginator = CoursePagination()
+
+    async def build():
+        rows = paginator.page_queryset(Course.objects.values("id", "title"), request)
+        page = paginator.get_page([row async for row in rows])
+        courses = Course.objects.filter(id__in=[row["id"] for row in page])
+        return paginator.get_paginated_data(await acourse_tree(courses, {"request": request, **params}))
+
+    key = await asnapshot_key(
+        "list", sparse_cache_key(params), paginator.page_cache_key(request, Course), request.build_absolute_uri("/")
+    )
+    return await acompressed_json(request, key, build)
+
+
+@api_view
+async def course_detail(request, slug):
+    params = parse_sparse_params(request.GET, "course")
+
+    async def build():
+        courses = await acourse_tree(Course.objects.filter(slug=slug), {"request": request, **params})
+        if not courses:
+            raise Http404(f"No {Course._meta.object_name} matches the given query.")
+        return courses[0]
+
+    key = await asnapshot_key("detail", slug, sparse_cache_key(params), request.build_absolute_uri("/"))
+    etag = snapshot_etag(key)
+    if not_modified(request, etag):
+        return set_validators(HttpResponseNotModified(), etag)
+    return set_validators(await acompressed_json(request, key, build), etag)
+
+
+@api_view
+async def lesson_by_number(request, course_slug, chapter_slug, number):
+    params = parse_sparse_params(request.GET, "lesson")
+    queryset = with_validators(Lesson.objects.select_related("chapter", "course"), "lesson", params["depth"])
+    lesson = await aget_object_or_404(queryset, course__slug=course_slug, chapter__slug=chapter_slug, number=number)
+
+    if not lesson.is_free_preview and not await ahas_course_access_from_token(request, lesson.course_id):
+        if request.auth is None:
+            raise exceptions.NotAuthenticated()
+        raise exceptions.PermissionDenied("Purchase this course to unlock this lesson.")
+    neighbours = await alesson_neighbours(lesson) if wants_neighbours(params) else None
+    etag, last_modified = validators(lesson, "lesson", params, neighbours)
+    private = not lesson.is_free_preview
+    if not_modified(request, etag, last_modified):
+        return set_validators(HttpResponseNotModified(), etag, last_modified, private=private)
+    path = prefetch_path("lesson", params["depth"])
+    if path:
+        await aprefetch_related_objects([lesson], path)
+    data = LessonSerializer(lesson, context={"request": request, **params}).data
+    if neighbours is not None:
+        data["previous"], data["next"] = neighbours
+    return set_validators(_response(data), etag, last_modified, private=private)
+
+
+@api_view
+async def course_progress(request, course_slug):
+    if request.auth is None:
+        raise exceptions.NotAuthenticated()
+    summary = (
+        await CourseProgressSummary.objects.filter(user=request.user, course__slug=course_slug)
+        .only("completed_count", "total_count")
+        .afirst()
+    )
+    if summary:
+        completed_lessons, total_lessons = summary.completed_count, summary.total_count
+    else:
+        course = await Course.objects.filter(slug=course_slug).afirst()
+        if course is None:
+            return _response({"detail": "Course not found"}, status=404)
+        total_lessons = await Lesson.objects.filter(course=course).acount()
+        completed_lessons = await LessonProgress.objects.filter(
+            user=request.user, lesson__course=course, completed_at__isnull=False
+        ).acount()
+
+    return _response({
+        "completed": completed_lessons,
+        "total": total_lessons,
+        "percentage": percentage(completed_lessons, total_lessons),
+    })
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "max_attempts", "run_at", "locked_by", "updated_at")
+    list_filter = ("status", "name")
+    search_fields = ("name", "last_error")
+    readonly_fields = ("attempts", "locked_at", "locked_by", "last_error", "created_at", "updated_at")
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry now")
+    def retry_now(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(status=Job.QUEUED, run_at=timezone.now(), attempts=0)
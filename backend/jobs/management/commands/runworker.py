@@ -0,0 +1,80 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from jobs.queue import claim, run, run_maintenance, run_pending
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run queued jobs. Workers coordinate through the database, so any number can run side by side."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.JOBS["CONCURRENCY"],
+                            help="Worker threads in this process.")
+        parser.add_argument("--poll-interval", type=float, default=settings.JOBS["POLL_INTERVAL"],
+                            help="Seconds an idle thread waits before polling again.")
+        parser.add_argument("--once", action="store_true",
+                            help="Run every job that is due, then exit (e.g. from cron).")
+
+    def handle(self, *args, concurrency, poll_interval, once=False, **options):
+        name = f"{socket.gethostname()}:{os.getpid()}"
+        if once:
+            run_maintenance()
+            ran = run_pending(name)
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} jobs."))
+            return
+
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stop.set())
+
+        threads = [
+            threading.Thread(target=self.work, args=(f"{name}:{i}", poll_interval), daemon=True)
+            for i in range(max(concurrency, 1))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Worker {name} started with {len(threads)} threads.")
+
+        next_maintenance = 0
+        while not self.stop.is_set():
+            if time.monotonic() >= next_maintenance:
+                close_old_connections()
+                run_maintenance()
+                next_maintenance = time.monotonic() + settings.JOBS["MAINTENANCE_INTERVAL"]
+            self.stop.wait(poll_interval)
+
+        self.stdout.write("Stopping: waiting for running jobs to finish.")
+        for thread in threads:
+            thread.join()
+
+    def work(self, worker_id, poll_interval):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim(worker_id)
+                except DatabaseError:
+                    # A lost connection or lock timeout must not kill the thread; poll again later.
+                    logger.exception("Worker %s could not claim jobs", worker_id)
+                    jobs = []
+                for job in jobs:
+                    try:
+                        run(job)
+                    except DatabaseError:
+                        # Recording the outcome failed; the job stays locked until release_stale requeues it.
+                        logger.exception("Worker %s could not record job #%s", worker_id, job.pk)
+                        close_old_connections()
+                if not jobs:
+                    self.stop.wait(poll_interval)
+        finally:
+            connection.close()
@@ -0,0 +1,144 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+_maintenance = []
+
+
+def job(name: str):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def register(func):
+        if name in _handlers and _handlers[name] is not func:
+            raise ValueError(f"Job handler {name!r} is already registered")
+        _handlers[name] = func
+        return func
+    return register
+
+
+def maintenance(func):
+    """Register ``func`` to run with every worker's periodic maintenance (``JOBS["MAINTENANCE_INTERVAL"]``)."""
+    if func not in _maintenance:
+        _maintenance.append(func)
+    return func
+
+
+def enqueue(name: str, payload=None, *, run_at=None, delay=None, max_attempts=None) -> Job:
+    """
+    Queue ``name`` to run in a worker with ``payload`` as keyword arguments.
+
+    The payload is stored as JSON, so pass IDs and plain values rather than model instances.
+    """
+    if name not in _handlers:
+        raise ValueError(f"No job handler registered for {name!r}")
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=run_at,
+        max_attempts=max_attempts or settings.JOBS["MAX_ATTEMPTS"],
+    )
+
+
+def claim(worker_id: str, limit: int = 1) -> list:
+    """
+    Lock up to ``limit`` due jobs for ``worker_id``.
+
+    ``SKIP LOCKED`` lets any number of workers poll the same table without blocking on, or
+    double-claiming, a row another worker is already taking.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by("run_at", "id")[:limit]
+        )
+        if jobs:
+            Job.objects.filter(pk__in=[j.pk for j in jobs]).update(
+                status=Job.RUNNING, locked_at=now, locked_by=worker_id, attempts=F("attempts") + 1
+            )
+    for j in jobs:
+        j.status, j.locked_at, j.locked_by, j.attempts = Job.RUNNING, now, worker_id, j.attempts + 1
+    return jobs
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: ``RETRY_BACKOFF`` seconds after the first failure, doubling up to ``MAX_BACKOFF``."""
+    seconds = settings.JOBS["RETRY_BACKOFF"] * 2 ** (attempts - 1)
+    return timedelta(seconds=min(seconds, settings.JOBS["MAX_BACKOFF"]))
+
+
+def run(job: Job) -> bool:
+    """Run a claimed job and record the outcome. Returns whether it succeeded."""
+    handler = _handlers.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No job handler registered for {job.name!r}")
+        handler(**job.payload)
+    except Exception:
+        logger.exception("Job %s #%s failed (attempt %s of %s)", job.name, job.pk, job.attempts, job.max_attempts)
+        if handler is None or job.attempts >= job.max_attempts:
+            status, run_at = Job.FAILED, job.run_at
+        else:
+            status, run_at = Job.QUEUED, timezone.now() + retry_delay(job.attempts)
+        Job.objects.filter(pk=job.pk).update(
+            status=status, run_at=run_at, locked_at=None, locked_by="",
+            last_error=traceback.format_exc(), updated_at=timezone.now(),
+        )
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, locked_at=None, locked_by="", last_error="", updated_at=timezone.now()
+    )
+    return True
+
+
+def run_pending(worker_id: str = "inline") -> int:
+    """Run due jobs one at a time until none is left. Returns how many ran."""
+    ran = 0
+    while jobs := claim(worker_id):
+        for j in jobs:
+            run(j)
+            ran += 1
+    return ran
+
+
+def release_stale() -> int:
+    """
+    Requeue jobs whose worker died mid-run: locked for longer than ``LOCK_TIMEOUT``. Jobs that have
+    used up their attempts fail instead, so one that kills its worker every time does not loop forever.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=settings.JOBS["LOCK_TIMEOUT"]))
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, locked_at=None, locked_by="", last_error="Worker lost while running the job", updated_at=now
+    )
+    return failed + stale.update(status=Job.QUEUED, locked_at=None, locked_by="", updated_at=now)
+
+
+def prune_done() -> int:
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS["KEEP_DONE"])
+    deleted, _ = Job.objects.filter(status=Job.DONE, updated_at__lt=cutoff).delete()
+    return deleted
+
+
+def run_maintenance() -> None:
+    """Release stale locks, prune finished jobs, then run the registered maintenance tasks."""
+    release_stale()
+    prune_done()
+    for func in _maintenance:
+        try:
+            func()
+        except Exception:
+            logger.exception("Maintenance task %s failed", func.__qualname__)
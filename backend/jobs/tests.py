@@ -0,0 +1,105 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+
+from .management.commands import runworker
+from .models import Job
+from .queue import claim, enqueue, job, release_stale, run, run_pending
+
+calls = []
+
+
+@job("tests.record")
+def record(value):
+    calls.append(value)
+
+
+@job("tests.fail")
+def fail():
+    raise RuntimeError("boom")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        enqueue("tests.record", {"value": 1})
+        enqueue("tests.record", {"value": 2})
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(set(Job.objects.values_list("status", flat=True)), {Job.DONE})
+
+    def test_enqueue_unknown_handler(self):
+        with self.assertRaises(ValueError):
+            enqueue("tests.missing")
+
+    def test_delayed_jobs_wait(self):
+        enqueue("tests.record", {"value": 1}, delay=timedelta(minutes=5))
+        self.assertEqual(run_pending(), 0)
+
+    def test_failures_back_off_then_fail(self):
+        queued = enqueue("tests.fail", max_attempts=2)
+        before = timezone.now()
+        with self.assertLogs("jobs.queue", "ERROR"):
+            self.assertEqual(run_pending(), 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.QUEUED, 1))
+        self.assertGreater(queued.run_at, before)
+        self.assertIn("RuntimeError: boom", queued.last_error)
+
+        Job.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        with self.assertLogs("jobs.queue", "ERROR"):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Job.FAILED, 2))
+
+    def test_claimed_jobs_are_not_claimed_again(self):
+        enqueue("tests.record", {"value": 1})
+        [claimed] = claim("a")
+        self.assertEqual(claim("b"), [])
+        run(claimed)
+        self.assertEqual(calls, [1])
+
+    def test_stale_locks_are_released(self):
+        enqueue("tests.record", {"value": 1})
+        claim("lost-worker")
+        Job.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(release_stale(), 1)
+        self.assertEqual(run_pending(), 1)
+
+    def test_stale_jobs_out_of_attempts_fail(self):
+        queued = enqueue("tests.record", {"value": 1}, max_attempts=1)
+        claim("lost-worker")
+        Job.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(release_stale(), 1)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.FAILED)
+        self.assertEqual(run_pending(), 0)
+
+    def test_runworker_once(self):
+        enqueue("tests.record", {"value": 1})
+        out = StringIO()
+        call_command("runworker", once=True, stdout=out)
+        self.assertIn("Ran 1 jobs.", out.getvalue())
+
+    def test_worker_survives_lost_connection_while_running(self):
+        enqueue("tests.record", {"value": 1})
+        command = runworker.Command()
+        command.stop = threading.Event()
+
+        def lose_connection(job):
+            command.stop.set()
+            raise OperationalError("server closed the connection unexpectedly")
+
+        with mock.patch.object(runworker, "run", side_effect=lose_connection), \
+                mock.patch.object(runworker, "close_old_connections"), \
+                mock.patch.object(runworker, "connection"):
+            with self.assertLogs(runworker.__name__, "ERROR"):
+                command.work("worker", 0)
@@ -1,10 +1,44 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.auth import forms as auth_forms
 from django.contrib.auth.admin import UserAdmin
-from .models import User, CoursePurchase
+from .models import User, CoursePurchase, StripeEvent
+
+
+class UniqueEmailMixin:
+    """
+    Refuse an email another account holds in any casing. ``email_normalized`` is not on the form,
+    so model validation skips its unique constraint and the save would fail with an IntegrityError.
+    """
+
+    def clean_email(self):
+        email = self.cleaned_data["email"]
+        normalized = User.normalize_email_address(email)
+        if (
+            normalized
+            and "email" in self.changed_data
+            and User.objects.filter(email_normalized=normalized).exclude(pk=self.instance.pk).exists()
+        ):
+            raise forms.ValidationError("A user with that email already exists.", code="unique")
+        return email
+
+
+class CustomUserChangeForm(UniqueEmailMixin, auth_forms.UserChangeForm):
+    class Meta(auth_forms.UserChangeForm.Meta):
+        model = User
+
+
+class CustomUserCreationForm(UniqueEmailMixin, auth_forms.UserCreationForm):
+    class Meta(auth_forms.UserCreationForm.Meta):
+        model = User
+        fields = ("username", "email")
+
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     model = User
+    form = CustomUserChangeForm
+    add_form = CustomUserCreationForm
 
     list_display = ('username', 'email', 'is_staff', 'is_superuser')
 
@@ -46,4 +80,12 @@ class CustomUserAdmin(UserAdmin):
 class CoursePurchaseAdmin(admin.ModelAdmin):
     list_display = ("user", "course", "purchased_at", "stripe_session_id")
     list_filter = ("course",)
-    search_fields = ("user__username", "course__title", "stripe_session_id")
\ No newline at end of file
+    search_fields = ("user__username", "course__title", "stripe_session_id")
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "status", "received_at", "processed_at")
+    list_filter = ("status", "type")
+    search_fields = ("event_id",)
+    readonly_fields = ("event_id", "type", "payload", "received_at", "processed_at", "error")
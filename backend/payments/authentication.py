@@ -0,0 +1,114 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _version_key(user_id) -> str:
+    return f"payments:auth-user-version:{user_id}"
+
+
+def _user_key(user_id, version) -> str:
+    return f"payments:auth-user:{user_id}:{version}"
+
+
+def _user_version(user_id) -> int:
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Seeded from the clock, like the course content version: a version lost to eviction
+        # never points back at an entry cached before it was bumped.
+        cache.add(_version_key(user_id), time.time_ns() // 1000, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+async def _auser_version(user_id) -> int:
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        await cache.aadd(_version_key(user_id), time.time_ns() // 1000, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        version = await cache.aget(_version_key(user_id))
+    return version
+
+
+def invalidate_cached_user(user_id) -> None:
+    """Stop serving the cached copy of the user, e.g. after a save, password change or deactivation."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        _user_version(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that keeps the resolved user in the cache for ``AUTH_USER_CACHE_TIMEOUT``
+    seconds, so polling endpoints do not load the user row on every request.
+
+    Entries are keyed by user ID and a per-user version that every save or delete bumps (see
+    ``payments.signals``), so a request that loaded the user just before a change cannot put
+    the old row back under the current key. A cached user still goes through the ``is_active``
+    and ``CHECK_REVOKE_TOKEN`` checks for every token, so a token issued before a password change
+    is refused even while the user's entry is warm.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # raises the usual InvalidToken
+        key = _user_key(user_id, _user_version(user_id))
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        else:
+            self._check_user(user, validated_token)
+        return user
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views, awaiting the cache and the database."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # raises the usual InvalidToken before any query
+        key = _user_key(user_id, await _auser_version(user_id))
+        user = await cache.aget(key)
+        if user is None:
+            user = await self._aload_user(validated_token, user_id)
+            await cache.aset(key, user, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        else:
+            self._check_user(user, validated_token)
+        return user
+
+    async def _aload_user(self, validated_token, user_id):
+        # The checks of JWTAuthentication.get_user, which has no async counterpart.
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+        self._check_user(user, validated_token)
+        return user
+
+    @staticmethod
+    def _check_user(user, validated_token):
+        # The checks JWTAuthentication.get_user applies after loading the user, which depend on
+        # the token as well as the user, so a cache hit cannot skip them.
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
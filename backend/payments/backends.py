@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+User = get_user_model()
+
+
+def _accounts(email, username):
+    if email is not None:
+        return User._default_manager.filter(email_normalized=User.normalize_email_address(email))
+    return User._default_manager.filter(**{User.USERNAME_FIELD: username})
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate with ``email`` and ``password``: one indexed lookup on ``email_normalized``.
+
+    Accounts that shared their email with another one before it had to be unique have no
+    ``email_normalized`` (see migration 0005); they authenticate with ``username`` instead.
+    """
+
+    def authenticate(self, request, email=None, password=None, username=None, **kwargs):
+        if (email is None and username is None) or password is None:
+            return None
+        user = _accounts(email, username).first()
+        if user is None:
+            # Hash anyway so response time does not reveal whether the email is registered.
+            User().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, email=None, password=None, username=None, **kwargs):
+        """As ``authenticate``, with the password hashing run in the ``payments.hashing`` pool."""
+        if (email is None and username is None) or password is None:
+            return None
+        user = await _accounts(email, username).afirst()
+        if user is None:
+            await hashing.ahash(password)
+            return None
+        is_correct, must_update = await hashing.averify(password, user.password)
+        if not is_correct:
+            return None
+        if must_update:
+            user.password = await hashing.ahash(password)
+            await user.asave(update_fields=["password"])
+        return user if self.user_can_authenticate(user) else None
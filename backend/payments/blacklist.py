@@ -0,0 +1,112 @@
+"""
+Refresh token blacklist without simplejwt's ``token_blacklist`` tables.
+
+A revoked token's JTI is kept in the cache until the token expires, so checking a token costs one
+cache read however many tokens have been issued. Revocations are also written to ``RevokedToken``
+in case the cache loses them. An in-process Bloom filter of that table rules out almost every
+token the cache has no entry for, so the table is only queried for the rare possible match.
+Expired rows are pruned by the job workers (``payments.jobs.prune_revoked_tokens``).
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about ``error_rate`` false positives up to ``capacity`` items."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from one 128-bit digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+_lock = threading.Lock()
+_filter = None
+_last_id = 0
+_synced_at = 0.0
+
+
+def _cache_key(jti: str) -> str:
+    return f"payments:revoked-token:{jti}"
+
+
+def _revoked_filter() -> BloomFilter:
+    """Bloom filter of the unexpired ``RevokedToken`` rows, topped up every ``SYNC_INTERVAL`` seconds."""
+    global _filter, _last_id, _synced_at
+    config = settings.TOKEN_BLACKLIST
+    with _lock:
+        if _filter is not None and time.monotonic() - _synced_at < config["SYNC_INTERVAL"]:
+            return _filter
+        if _filter is None or _filter.count >= _filter.capacity:
+            # Start over, which also forgets the tokens that have expired since the last rebuild. Room for
+            # twice the rows held so far, so a table past BLOOM_CAPACITY is not rescanned on every top-up.
+            capacity = max(config["BLOOM_CAPACITY"], 2 * (_filter.count if _filter is not None else 0))
+            _filter, _last_id = BloomFilter(capacity, config["BLOOM_ERROR_RATE"]), 0
+        rows = (
+            RevokedToken.objects.filter(id__gt=_last_id, expires_at__gt=timezone.now())
+            .order_by("id")
+            .values_list("id", "jti")
+        )
+        for row_id, jti in rows.iterator(chunk_size=10_000):
+            _filter.add(jti)
+            _last_id = row_id
+        _synced_at = time.monotonic()
+        return _filter
+
+
+def is_revoked(jti: str) -> bool:
+    if cache.get(_cache_key(jti)) is not None:
+        return True
+    if jti not in _revoked_filter():
+        return False
+    return RevokedToken.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+
+
+def revoke(payload: dict) -> bool:
+    """
+    Revoke the token with ``payload`` until it expires. Returns ``False`` if it already was, so a
+    refresh token replayed after rotation is refused even when both uses pass ``is_revoked``.
+    """
+    jti = payload[api_settings.JTI_CLAIM]
+    expires = payload["exp"]
+    added = cache.add(_cache_key(jti), 1, timeout=max(int(expires - time.time()), 1))
+    RevokedToken.objects.bulk_create(
+        [RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(expires, tz=dt_timezone.utc))],
+        ignore_conflicts=True,
+    )
+    with _lock:
+        if _filter is not None:
+            _filter.add(jti)
+    return added
+
+
+def prune_expired() -> int:
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CoursePurchase
+
+# Access-token claim listing the purchased course IDs, so access checks need no database round trip.
+COURSES_CLAIM = "courses"
+
+
+def _cache_key(user_id) -> str:
+    return f"payments:entitlements:{user_id}"
+
+
+def _changed_key(user_id) -> str:
+    return f"payments:entitlements-changed:{user_id}"
+
+
+def entitled_course_ids(user_id) -> frozenset:
+    """IDs of the courses the user has purchased, cached until their purchases change."""
+    key = _cache_key(user_id)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(CoursePurchase.objects.filter(user_id=user_id).values_list("course_id", flat=True))
+        cache.set(key, course_ids, timeout=settings.ENTITLEMENTS_CACHE_TIMEOUT)
+    return course_ids
+
+
+async def aentitled_course_ids(user_id) -> frozenset:
+    key = _cache_key(user_id)
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        rows = CoursePurchase.objects.filter(user_id=user_id).values_list("course_id", flat=True)
+        course_ids = frozenset([course_id async for course_id in rows])
+        await cache.aset(key, course_ids, timeout=settings.ENTITLEMENTS_CACHE_TIMEOUT)
+    return course_ids
+
+
+def get_entitled_course_ids(user) -> frozenset:
+    if not user or not user.is_authenticated:
+        return frozenset()
+    return entitled_course_ids(user.pk)
+
+
+def _claim_is_current(token, changed_at) -> bool:
+    return changed_at is None or token.payload.get("iat", 0) > changed_at
+
+
+def has_course_access(user, course_id: int) -> bool:
+    return course_id in get_entitled_course_ids(user)
+
+
+def has_course_access_from_token(request, course_id: int) -> bool:
+    """
+    Answer from the access token's ``courses`` claim when it is still current, else fall back to
+    the cached purchase set. Tokens issued before the user's last purchase change are stale.
+    """
+    token = getattr(request, "auth", None)
+    if token is not None and COURSES_CLAIM in token.payload:
+        changed_at = cache.get(_changed_key(token.payload.get(api_settings.USER_ID_CLAIM)))
+        if _claim_is_current(token, changed_at):
+            return course_id in token.payload[COURSES_CLAIM]
+    return has_course_access(request.user, course_id)
+
+
+async def ahas_course_access_from_token(request, course_id: int) -> bool:
+    token = getattr(request, "auth", None)
+    if token is not None and COURSES_CLAIM in token.payload:
+        changed_at = await cache.aget(_changed_key(token.payload.get(api_settings.USER_ID_CLAIM)))
+        if _claim_is_current(token, changed_at):
+            return course_id in token.payload[COURSES_CLAIM]
+    if not request.user or not request.user.is_authenticated:
+        return False
+    return course_id in await aentitled_course_ids(request.user.pk)
+
+
+def invalidate_entitlements(user_id) -> None:
+    invalidate_many_entitlements([user_id])
+
+
+def invalidate_many_entitlements(user_ids) -> None:
+    user_ids = list(user_ids)
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+    # Any access token carrying claims older than this is stale; it expires within its lifetime anyway.
+    changed_at = int(time.time())
+    cache.set_many(
+        {_changed_key(user_id): changed_at for user_id in user_ids},
+        timeout=int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+    )
@@ -0,0 +1,99 @@
+"""
+Password hashing off the event loop.
+
+PBKDF2 takes most of a login or registration. Under ASGI the async auth views hand it to a small,
+fixed-size thread pool (``hashlib`` releases the GIL while hashing), so a burst of logins waits in
+this pool's queue instead of tying up the workers that serve course content. Requests beyond
+``PASSWORD_HASHING["MAX_QUEUE"]`` waiting hashes are turned away with ``HashingOverloaded``.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_queued = 0
+_running = 0
+
+
+class HashingOverloaded(Exception):
+    """More hashes are waiting than ``PASSWORD_HASHING["MAX_QUEUE"]`` allows."""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING["CONCURRENCY"], thread_name_prefix="password-hashing"
+            )
+        return _executor
+
+
+@receiver(setting_changed)
+def _reset_executor(*, setting, **kwargs):
+    global _executor
+    if setting == "PASSWORD_HASHING":
+        with _lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _tracked(func, *args):
+    global _queued, _running
+    with _lock:
+        _queued -= 1
+        _running += 1
+    try:
+        return func(*args)
+    finally:
+        with _lock:
+            _running -= 1
+
+
+async def run(func, *args):
+    """Run ``func(*args)`` in the hashing pool and return its result."""
+    global _queued
+    executor = _get_executor()
+    with _lock:
+        if _queued >= settings.PASSWORD_HASHING["MAX_QUEUE"]:
+            logger.warning("Password hashing queue is full (%s running, %s queued)", _running, _queued)
+            raise HashingOverloaded()
+        _queued += 1
+    try:
+        future = asyncio.get_running_loop().run_in_executor(executor, functools.partial(_tracked, func, *args))
+    except BaseException:
+        with _lock:
+            _queued -= 1
+        raise
+    return await future
+
+
+def stats() -> dict:
+    """Pool size, hashes in progress and hashes waiting for a thread (the queue depth)."""
+    with _lock:
+        return {"concurrency": settings.PASSWORD_HASHING["CONCURRENCY"], "running": _running, "queued": _queued}
+
+
+def _verify(password, encoded):
+    outdated = []
+    return check_password(password, encoded, setter=outdated.append), bool(outdated)
+
+
+async def averify(password, encoded):
+    """``(is_correct, must_update)`` for ``password`` against the stored ``encoded`` hash."""
+    return await run(_verify, password, encoded)
+
+
+async def ahash(password) -> str:
+    return await run(make_password, password)
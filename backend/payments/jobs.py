@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from courses.models import Course
+from jobs.queue import job, maintenance
+
+from .blacklist import prune_expired
+from .entitlements import invalidate_many_entitlements
+from .models import CoursePurchase, StripeEvent
+
+User = get_user_model()
+
+
+@job("payments.process_stripe_events")
+def process_stripe_events(batch_size=None):
+    """
+    Apply every pending ``StripeEvent``, ``batch_size`` at a time.
+
+    Each batch costs the same handful of queries however many events it holds: users and
+    courses are resolved with one query each and purchases are written with one insert.
+    Workers skip batches another worker has locked, so concurrent runs never overlap.
+    """
+    batch_size = batch_size or settings.STRIPE_EVENT_BATCH_SIZE
+    processed = 0
+    while True:
+        with transaction.atomic():
+            events = list(
+                StripeEvent.objects.select_for_update(skip_locked=True)
+                .filter(status=StripeEvent.PENDING)
+                .order_by("received_at")[:batch_size]
+            )
+            if not events:
+                return processed
+            buyers = _apply_batch(events)
+        invalidate_many_entitlements(buyers)
+        processed += len(events)
+        if len(events) < batch_size:
+            return processed
+
+
+@maintenance
+def prune_revoked_tokens():
+    """Forget revoked refresh tokens that have expired anyway; keeps ``RevokedToken`` bounded."""
+    prune_expired()
+
+
+def _apply_batch(events) -> set:
+    """Write the purchases for ``events`` and record each event's outcome. Returns the buyers' user IDs."""
+    checkouts = {}
+    outcomes = defaultdict(list)
+    for event in events:
+        try:
+            checkout = _checkout(event)
+        except Exception as exc:
+            # A malformed payload fails on its own instead of rolling back, and blocking, the whole batch.
+            outcomes[(StripeEvent.FAILED, f"Malformed event: {exc!r}")].append(event.pk)
+            continue
+        if checkout is None:
+            # Payment Link sessions carry no metadata; they are recorded by payment-success instead.
+            outcomes[(StripeEvent.IGNORED, "")].append(event.pk)
+        else:
+            checkouts[event] = checkout
+
+    user_ids = {int(uid) for uid, *_ in checkouts.values() if uid.isdigit()}
+    users = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True)) if user_ids else set()
+    slugs = {slug for _, slug, *_ in checkouts.values()}
+    courses = dict(Course.objects.filter(slug__in=slugs).values_list("slug", "id").order_by()) if slugs else {}
+
+    purchases = {}
+    for event, (uid, slug, session_id, payment_intent) in checkouts.items():
+        user_id = int(uid) if uid.isdigit() else None
+        if user_id not in users or slug not in courses:
+            outcomes[(StripeEvent.FAILED, f"Unknown user {uid} or course {slug}")].append(event.pk)
+            continue
+        purchases.setdefault((user_id, courses[slug]), CoursePurchase(
+            user_id=user_id,
+            course_id=courses[slug],
+            stripe_session_id=session_id,
+            stripe_payment_intent=payment_intent,
+        ))
+        outcomes[(StripeEvent.PROCESSED, "")].append(event.pk)
+
+    if purchases:
+        CoursePurchase.objects.bulk_create(purchases.values(), ignore_conflicts=True)
+    now = timezone.now()
+    for (status, error), pks in outcomes.items():
+        StripeEvent.objects.filter(pk__in=pks).update(status=status, error=error, processed_at=now)
+    # bulk_create sends no post_save, so the entitlement signal never fires for these purchases.
+    return {user_id for user_id, _ in purchases}
+
+
+def _checkout(event):
+    """``(user_id, course_slug, session_id, payment_intent)`` of a checkout with metadata, else ``None``."""
+    if event.type != "checkout.session.completed":
+        return None
+    session = event.payload.get("data", {}).get("object", {})
+    metadata = session.get("metadata") or {}
+    if not (metadata.get("user_id") and metadata.get("course_slug")):
+        return None
+    return (
+        str(metadata["user_id"]),
+        str(metadata["course_slug"]),
+        str(session.get("id") or ""),
+        str(session.get("payment_intent") or ""),
+    )
@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test.utils import override_settings
+
+User = get_user_model()
+
+PREFIX = "bench-login-"
+PASSWORD = "bench-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare email login lookups on a large user table: the former email__iexact lookup plus a "
+        "username authenticate() against the indexed email_normalized backend. Seeds the users first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--logins", type=int, default=500)
+        parser.add_argument("--real-hasher", action="store_true",
+                            help="Keep the configured password hasher; by default a fast one isolates lookup cost.")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded users for the next run.")
+
+    def handle(self, *args, users, logins, real_hasher=False, keep=False, **options):
+        hashers = None if real_hasher else ["django.contrib.auth.hashers.MD5PasswordHasher"]
+        with override_settings(**({"PASSWORD_HASHERS": hashers} if hashers else {})):
+            self.seed(users)
+            sample = [f"{PREFIX}{i}@Example.com" for i in random.sample(range(users), min(logins, users))]
+            results = {"iexact + username": self.measure(self.legacy_login, sample),
+                       "email_normalized": self.measure(self.email_login, sample)}
+
+        for name, (timings, queries) in results.items():
+            timings.sort()
+            self.stdout.write(
+                f"{name:>18}: mean {statistics.mean(timings):7.2f} ms  p50 {timings[len(timings) // 2]:7.2f} ms  "
+                f"p99 {timings[int(len(timings) * 0.99) - 1]:7.2f} ms  {queries / len(timings):.1f} queries/login"
+            )
+        if not keep:
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+    def seed(self, count):
+        existing = User.objects.filter(username__startswith=PREFIX).count()
+        if existing >= count:
+            return
+        password = make_password(PASSWORD)
+        started = time.perf_counter()
+        for start in range(existing, count, 10_000):
+            User.objects.bulk_create(
+                User(username=f"{PREFIX}{i}", email=f"{PREFIX}{i}@Example.com",
+                     email_normalized=f"{PREFIX}{i}@example.com", password=password)
+                for i in range(start, min(start + 10_000, count))
+            )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {User._meta.db_table}")
+        self.stdout.write(f"Seeded {count - existing} users in {time.perf_counter() - started:.1f}s.")
+
+    def legacy_login(self, email):
+        user = User.objects.filter(email__iexact=email.strip().lower()).first()
+        return authenticate(username=user.username, password=PASSWORD)
+
+    def email_login(self, email):
+        return authenticate(email=email, password=PASSWORD)
+
+    def measure(self, login, emails):
+        timings = []
+        with override_settings(DEBUG=True):
+            reset_queries()
+            for email in emails:
+                started = time.perf_counter()
+                if login(email) is None:
+                    raise RuntimeError(f"Login failed for {email}")
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(connection.queries)
+        return timings, queries
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from payments.reconcile import iter_records, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Create missing course purchases from a Stripe checkout session export (CSV, JSON array or NDJSON). "
+        "Existing purchases are left untouched, so the command can be re-run safely."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Exported sessions file.")
+        parser.add_argument("--format", choices=["csv", "json"], help="Defaults to the file extension.")
+        parser.add_argument("--course", metavar="SLUG",
+                            help="Course for sessions without course_slug metadata (Payment Link checkouts).")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be created without writing.")
+
+    def handle(self, *args, path, format=None, course=None, chunk_size=5000, dry_run=False, **options):
+        if course and not Course.objects.filter(slug=course).exists():
+            raise CommandError(f"Unknown course slug: {course}")
+
+        started = time.perf_counter()
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as fh:
+                stats = reconcile(iter_records(fh, format), default_course=course, chunk_size=chunk_size,
+                                  dry_run=dry_run)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+
+        verb = "Would create" if dry_run else "Created"
+        self.stdout.write(
+            f"Read {stats['rows']} sessions in {elapsed:.2f}s ({stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s): "
+            f"{stats['matched']} matched, {stats['unmatched']} unmatched, {stats['unpaid']} unpaid."
+        )
+        self.stdout.write(self.style.SUCCESS(f"{verb} {stats['created']} purchases."))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+def backfill_email_normalized(apps, schema_editor):
+    # When several accounts share an email in different casing, the earliest active one keeps it,
+    # matching the account email login used to pick; the others sign in with their username (payments.backends).
+    User = apps.get_model("payments", "User")
+    seen = set()
+    batch = []
+    users = User.objects.exclude(email="").order_by("-is_active", "date_joined", "id").only("id", "email")
+    for user in users.iterator(chunk_size=2000):
+        normalized = user.email.strip().lower()
+        if normalized in seen:
+            continue
+        seen.add(normalized)
+        user.email_normalized = normalized
+        batch.append(user)
+        if len(batch) >= 2000:
+            User.objects.bulk_update(batch, ["email_normalized"])
+            batch = []
+    User.objects.bulk_update(batch, ["email_normalized"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_stripeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_email_normalized, migrations.RunPython.noop),
+    ]
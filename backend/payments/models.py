@@ -24,6 +24,31 @@ class User(AbstractUser):
         verbose_name="user permissions",
     )
     has_paid = models.BooleanField(default=False)
+    # Lowercased ``email``, kept in sync by save(). Unique so an email identifies one account and
+    # login resolves it with an index lookup instead of an ``UPPER(email)`` scan.
+    email_normalized = models.CharField(max_length=254, unique=True, null=True, blank=True, editable=False)
+
+    @staticmethod
+    def normalize_email_address(email) -> str:
+        return (email or "").strip().lower()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "email" in update_fields:
+            normalized = self.normalize_email_address(self.email) or None
+            if (
+                normalized is not None
+                and self.email_normalized is None
+                and not self._state.adding
+                and User.objects.filter(email_normalized=normalized).exclude(pk=self.pk).exists()
+            ):
+                # An account that shared its email before the column was unique (see migration 0005)
+                # leaves it to the account holding it.
+                normalized = None
+            self.email_normalized = normalized
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "email_normalized"}
+        super().save(*args, **kwargs)
 
 
 class CoursePurchase(models.Model):
@@ -37,4 +62,48 @@ class CoursePurchase(models.Model):
         unique_together = (("user", "course"),)
 
     def __str__(self):
-        return f"{self.user.username} -> {self.course.title} at {self.purchased_at}"
\ No newline at end of file
+        return f"{self.user.username} -> {self.course.title} at {self.purchased_at}"
+
+class StripeEvent(models.Model):
+    """Every webhook event received, keyed by Stripe's event ID so redeliveries are recorded once."""
+
+    PENDING = "pending"
+    PROCESSED = "processed"
+    IGNORED = "ignored"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSED, "Processed"),
+        (IGNORED, "Ignored"),
+        (FAILED, "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True, default="")
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["received_at"]
+        indexes = [
+            models.Index(fields=["status", "received_at"], name="stripe_event_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.type}, {self.status})"
+
+
+class RevokedToken(models.Model):
+    """
+    Durable copy of the refresh token revocations kept in the cache (see payments.blacklist), for
+    when the cache loses them. Rows are only needed until the token expires and are pruned after.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.jti} (until {self.expires_at})"
@@ -0,0 +1,153 @@
+"""
+Backfill ``CoursePurchase`` rows from Stripe's exported checkout sessions.
+
+Exports are streamed record by record and applied in chunks: each chunk costs one query for
+users by ID, one for users by email, one for existing purchases and one insert, however many
+rows it holds.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+
+from courses.models import Course
+
+from .entitlements import invalidate_many_entitlements
+from .models import CoursePurchase
+
+User = get_user_model()
+
+# Column names used by Stripe's dashboard CSV export and by API objects flattened with dots.
+FIELDS = {
+    "session_id": ("id", "session id", "checkout session id"),
+    "payment_intent": ("payment_intent", "payment intent", "payment intent id"),
+    "email": ("customer_details.email", "customer email", "customer_email", "email"),
+    "user_id": ("metadata.user_id", "user_id (metadata)", "user_id"),
+    "course_slug": ("metadata.course_slug", "course_slug (metadata)", "course_slug"),
+    "payment_status": ("payment_status", "payment status"),
+}
+PAID_STATUSES = {"paid", "no_payment_required"}
+READ_SIZE = 1 << 16
+
+
+def iter_records(fh, fmt=None):
+    """
+    Yield each session in ``fh`` as a dict of ``FIELDS``. ``fmt`` is ``csv`` or ``json`` (a JSON array or NDJSON).
+
+    ``payment_status`` is ``None`` when the export has no status column (or the JSON object no status
+    key) and ``""`` when the cell is blank.
+    """
+    if fmt is None:
+        fmt = "json" if getattr(fh, "name", "").lower().endswith((".json", ".jsonl", ".ndjson")) else "csv"
+    rows = csv.DictReader(fh) if fmt == "csv" else (_flatten(obj) for obj in _iter_json(fh))
+    for row in rows:
+        row = {(key or "").strip().lower(): value for key, value in row.items()}
+        record = {
+            field: next((str(row[name]).strip() for name in names if row.get(name) not in (None, "")), "")
+            for field, names in FIELDS.items()
+        }
+        if not any(name in row for name in FIELDS["payment_status"]):
+            record["payment_status"] = None
+        yield record
+
+
+def _iter_json(fh):
+    """Decode consecutive JSON values, unwrapping a top-level array, while holding one read buffer in memory."""
+    decoder = json.JSONDecoder()
+    buffer, pos, in_array = "", 0, None
+    while True:
+        chunk = fh.read(READ_SIZE)
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and in_array is None:
+                in_array = buffer[pos] == "["
+                pos += in_array
+                continue
+            if pos < len(buffer) and buffer[pos] == "]" and in_array:
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    if buffer[pos:].strip():
+                        raise
+                    return
+                break  # value continues in the next chunk
+            yield obj
+            pos = end
+        if not chunk:
+            return
+
+
+def _flatten(obj, prefix=""):
+    flat = {}
+    for key, value in obj.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def reconcile(records, default_course=None, chunk_size=5000, dry_run=False) -> dict:
+    """
+    Create the purchases missing for ``records``; existing ones are left untouched.
+
+    Sessions without a ``course_slug`` (Payment Link checkouts) are assigned ``default_course``,
+    and sessions without a ``user_id`` are matched to a user by email.
+    """
+    courses = dict(Course.objects.values_list("slug", "id").order_by())
+    stats = {"rows": 0, "unpaid": 0, "unmatched": 0, "matched": 0, "created": 0}
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        stats["rows"] += len(chunk)
+        # Without a status column the export is taken to list paid sessions only; a blank status is not paid.
+        paid = [r for r in chunk if r["payment_status"] is None or r["payment_status"].lower() in PAID_STATUSES]
+        stats["unpaid"] += len(chunk) - len(paid)
+
+        ids = {int(r["user_id"]) for r in paid if r["user_id"].isdigit()}
+        known_ids = set(User.objects.filter(id__in=ids).values_list("id", flat=True)) if ids else set()
+        emails = {r["email"].lower() for r in paid if r["email"] and not r["user_id"].isdigit()}
+        by_email = {}
+        if emails:
+            by_email = dict(
+                User.objects.filter(email_normalized__in=emails, is_active=True).values_list("email_normalized", "id")
+            )
+
+        purchases = {}
+        for r in paid:
+            if r["user_id"].isdigit():
+                user_id = int(r["user_id"]) if int(r["user_id"]) in known_ids else None
+            else:
+                user_id = by_email.get(r["email"].lower())
+            course_id = courses.get(r["course_slug"] or default_course)
+            if user_id is None or course_id is None:
+                stats["unmatched"] += 1
+                continue
+            stats["matched"] += 1
+            purchases.setdefault((user_id, course_id), CoursePurchase(
+                user_id=user_id,
+                course_id=course_id,
+                stripe_session_id=r["session_id"],
+                stripe_payment_intent=r["payment_intent"],
+            ))
+        if not purchases:
+            continue
+
+        existing = set(
+            CoursePurchase.objects.filter(
+                user_id__in={user_id for user_id, _ in purchases},
+                course_id__in={course_id for _, course_id in purchases},
+            ).values_list("user_id", "course_id")
+        )
+        missing = [purchase for key, purchase in purchases.items() if key not in existing]
+        stats["created"] += len(missing)
+        if missing and not dry_run:
+            # ignore_conflicts covers purchases recorded concurrently by the webhook.
+            CoursePurchase.objects.bulk_create(missing, ignore_conflicts=True)
+            invalidate_many_entitlements({purchase.user_id for purchase in missing})
+    return stats
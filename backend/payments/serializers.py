@@ -1,7 +1,7 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
 
 User = get_user_model()
 
@@ -13,24 +13,29 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ('username', 'email', 'password')
 
     def validate_email(self, value: str):
-        normalized = value.strip().lower()
-        if User.objects.filter(email__iexact=normalized).exists():
+        normalized = User.normalize_email_address(value)
+        if User.objects.filter(email_normalized=normalized).exists():
             raise serializers.ValidationError("A user with that email already exists.")
         return normalized
 
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             username=validated_data['username'].strip(),
             email=validated_data['email']
         )
-        user.set_password(validated_data['password'])
-        user.save()
+        if 'password_hash' in validated_data:
+            # Hashed ahead of time off the event loop (payments.views_auth.register).
+            user.password = validated_data['password_hash']
+        else:
+            user.set_password(validated_data['password'])
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            # Registered concurrently since the field validators ran: report whichever value was taken.
+            if User.objects.filter(email_normalized=user.email_normalized).exists():
+                raise serializers.ValidationError({"email": ["A user with that email already exists."]})
+            if User.objects.filter(username=user.username).exists():
+                raise serializers.ValidationError({"username": ["A user with that username already exists."]})
+            raise
         return user
-
-
-class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
-    @classmethod
-    def get_token(cls, user):
-        token = super().get_token(user)
-        token['username'] = user.username
-        return token
\ No newline at end of file
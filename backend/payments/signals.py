@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .entitlements import invalidate_entitlements
+from .models import CoursePurchase, User
+
+
+@receiver(post_save, sender=CoursePurchase)
+@receiver(post_delete, sender=CoursePurchase)
+def invalidate_purchaser_entitlements(sender, instance, **kwargs):
+    # After commit: invalidated earlier, a concurrent request could cache the old purchases again.
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_entitlements(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    # Covers password changes and deactivation, which both save the user. After commit, like purchases.
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
@@ -1,3 +1,442 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from courses.tests import COURSES, CatalogDataMixin
+from jobs.models import Job
+from jobs.queue import run_maintenance, run_pending
+
+from . import blacklist, hashing
+from .admin import CustomUserChangeForm, CustomUserCreationForm
+from .blacklist import BloomFilter
+from .entitlements import COURSES_CLAIM, has_course_access
+from .jobs import process_stripe_events
+from .models import CoursePurchase, RevokedToken, StripeEvent, User
+from .reconcile import reconcile
+from .serializers import RegisterSerializer
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class PaymentsQueryBudgetTests(CatalogDataMixin, TestCase):
+    """Per-route query budgets for ``payments.urls``. Budgets include JWT's user lookup."""
+
+    def test_create_payment_link(self):
+        with self.assertQueryBudget(2):
+            response = self.client.post(
+                "/api/payments/create-payment-link/",
+                json.dumps({"course_slug": self.course.slug}),
+                content_type="application/json",
+                **self.auth(),
+            )
+        self.assertIn("payment_url", response.json())
+
+    def test_check_access(self):
+        with self.assertQueryBudget(3):  # cold: the user, the course ID and the purchases
+            response = self.client.get(f"/api/payments/check-access/{self.course.slug}/", **self.auth())
+        self.assertTrue(response.json()["has_access"])
+
+    def test_check_access_from_token_claim(self):
+        access = self.login()["access"]
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {access}"}
+        url = f"/api/payments/check-access/{self.course.slug}/"
+        self.client.get(url, **headers)
+        # The course slug and the user are cached and access comes from the token: no queries, however many checks.
+        with self.assertQueryBudget(0):
+            for _ in range(100):
+                response = self.client.get(url, **headers)
+        self.assertTrue(response.json()["has_access"])
+
+    def test_check_access_refuses_deactivated_user(self):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {self.login()['access']}"}
+        url = f"/api/payments/check-access/{self.course.slug}/"
+        self.assertEqual(self.client.get(url, **headers).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.learner.is_active = False
+            self.learner.save(update_fields=["is_active"])
+        self.assertEqual(self.client.get(url, **headers).status_code, 401)
+
+    def test_token_claim_goes_stale_on_purchase(self):
+        buyer = self.others[0]
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {self.login('user0@example.com', 'pw')['access']}"}
+        url = f"/api/payments/check-access/{self.course.slug}/"
+        self.assertFalse(self.client.get(url, **headers).json()["has_access"])
+        with self.captureOnCommitCallbacks(execute=True):
+            CoursePurchase.objects.create(user=buyer, course=self.course)
+        self.assertTrue(self.client.get(url, **headers).json()["has_access"])
+
+    def test_payment_success(self):
+        buyer = self.others[0]
+        with self.assertQueryBudget(6):
+            response = self.client.get(
+                f"/api/payments/payment-success/?course={self.course.slug}&user_id={buyer.id}"
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(CoursePurchase.objects.filter(user=buyer, course=self.course).exists())
+
+    def checkout_event(self, buyer, event_id="evt_test_1"):
+        return {
+            "id": event_id,
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": f"cs_{event_id}",
+                "payment_intent": f"pi_{event_id}",
+                "metadata": {"user_id": str(buyer.id), "course_slug": self.course.slug},
+            }},
+        }
+
+    def post_webhook(self, event):
+        with mock.patch("stripe.Webhook.construct_event", return_value=event):
+            return self.client.post(
+                "/api/payments/webhook/", json.dumps(event), content_type="application/json", HTTP_STRIPE_SIGNATURE="t=1"
+            )
+
+    def test_webhook_checkout_completed(self):
+        buyer = self.others[1]
+        # Event insert in a savepoint guarding the unique event ID, then the job insert: the purchase
+        # is recorded by a worker.
+        with self.assertQueryBudget(4):
+            response = self.post_webhook(self.checkout_event(buyer))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CoursePurchase.objects.filter(user=buyer, course=self.course).exists())
+        run_pending()
+        self.assertTrue(CoursePurchase.objects.filter(user=buyer, course=self.course).exists())
+        self.assertEqual(StripeEvent.objects.get().status, StripeEvent.PROCESSED)
+
+    def test_webhook_redelivery_is_recorded_once(self):
+        event = self.checkout_event(self.others[1])
+        for _ in range(3):
+            self.assertEqual(self.post_webhook(event).status_code, 200)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        self.assertEqual(Job.objects.count(), 1)  # redeliveries queue no further runs
+        run_pending()
+        self.assertEqual(CoursePurchase.objects.filter(user=self.others[1]).count(), 1)
+
+    def test_stripe_events_are_applied_in_bulk(self):
+        # Includes a duplicate purchase, an unknown user, an event type with nothing to do and a malformed payload.
+        events = [self.checkout_event(buyer, f"evt_{buyer.id}") for buyer in self.others]
+        events.append(self.checkout_event(self.others[0], "evt_dup"))
+        events.append({**self.checkout_event(self.others[0], "evt_ghost"), "data": {"object": {
+            "metadata": {"user_id": "999999", "course_slug": self.course.slug},
+        }}})
+        events.append({"id": "evt_invoice", "type": "invoice.payment_succeeded", "data": {"object": {}}})
+        events.append({"id": "evt_bad", "type": "checkout.session.completed", "data": {"object": ["not", "a", "session"]}})
+        StripeEvent.objects.bulk_create(
+            StripeEvent(event_id=e["id"], type=e["type"], payload=e) for e in events
+        )
+        self.assertFalse(has_course_access(self.others[0], self.course.id))  # warm the entitlement cache
+
+        # One transaction: events, users, courses, purchases, then one update per outcome.
+        with self.assertQueryBudget(10):
+            self.assertEqual(process_stripe_events(), len(events))
+        self.assertEqual(CoursePurchase.objects.filter(course=self.course).count(), 1 + len(self.others))
+        self.assertEqual(
+            dict(StripeEvent.objects.values_list("event_id", "status").filter(
+                event_id__in=["evt_ghost", "evt_invoice", "evt_bad"]
+            )),
+            {"evt_ghost": StripeEvent.FAILED, "evt_invoice": StripeEvent.IGNORED, "evt_bad": StripeEvent.FAILED},
+        )
+        self.assertTrue(has_course_access(self.others[0], self.course.id))
+
+    def test_register(self):
+        payload = {"username": "newbie", "email": "Newbie@Example.com", "password": "a-Long-passw0rd!"}
+        # Username and email checks, then one insert in a savepoint guarding the unique email.
+        with self.assertQueryBudget(5):
+            response = self.client.post("/api/payments/register/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_token_obtain(self):
+        payload = {"email": "learner@example.com", "password": "pw-learner-1"}
+        # User by normalized email, purchases for the ``courses`` claim, last_login.
+        with self.assertQueryBudget(3):
+            response = self.client.post("/api/payments/token/", json.dumps(payload), content_type="application/json")
+        self.assertIn("access", response.json())
+
+    def test_login_by_email_ignores_case(self):
+        self.assertIn("access", self.login("  LEARNER@Example.com ", "pw-learner-1"))
+        response = self.client.post(
+            "/api/payments/token/", json.dumps({"email": "learner@example.com", "password": "wrong"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_login_when_hashing_pool_is_saturated(self):
+        with mock.patch("payments.hashing.run", side_effect=hashing.HashingOverloaded):
+            response = self.client.post(
+                "/api/payments/token/", json.dumps({"email": "learner@example.com", "password": "pw-learner-1"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_health_check_hides_hashing_stats(self):
+        self.assertEqual(self.client.get("/health/").json(), {"status": "healthy", "service": "django-api"})
+        self.assertEqual(self.client.get("/health/password-hashing/").status_code, 302)
+        self.client.force_login(User.objects.create_user(username="ops", password="pw", is_staff=True))
+        self.assertEqual(set(self.client.get("/health/password-hashing/").json()), {"concurrency", "running", "queued"})
+
+    def test_register_race_reports_taken_username(self):
+        serializer = RegisterSerializer(data={"username": "racer", "email": "racer@example.com", "password": "a-Long-passw0rd!"})
+        self.assertTrue(serializer.is_valid())
+        User.objects.create_user(username="racer", email="other-racer@example.com", password="pw")
+        with self.assertRaises(ValidationError) as raised:
+            serializer.save()
+        self.assertEqual(list(raised.exception.detail), ["username"])
+
+    def test_register_rejects_email_in_other_case(self):
+        payload = {"username": "copycat", "email": "Learner@EXAMPLE.com", "password": "a-Long-passw0rd!"}
+        response = self.client.post("/api/payments/register/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.json())
+
+    def test_email_backfill_keeps_earliest_active_account(self):
+        migration = import_module("payments.migrations.0005_user_email_normalized")
+        User.objects.filter(pk=self.others[0].pk).update(is_active=False)
+        clone = User.objects.create_user(username="clone", email="other@example.com", password="pw")
+        User.objects.filter(pk=clone.pk).update(email="USER0@example.com")
+        User.objects.filter(pk=self.others[1].pk).update(email="USER1@example.com")
+        User.objects.update(email_normalized=None)
+
+        migration.backfill_email_normalized(django_apps, None)
+        normalized = dict(User.objects.values_list("pk", "email_normalized"))
+        self.assertEqual(normalized[clone.pk], "user0@example.com")
+        self.assertIsNone(normalized[self.others[0].pk])
+        self.assertEqual(normalized[self.others[1].pk], "user1@example.com")
+
+        # The account left without the value keeps saving instead of colliding with the holder.
+        duplicate = User.objects.get(pk=self.others[0].pk)
+        duplicate.first_name = "Dup"
+        duplicate.save()
+        duplicate.refresh_from_db()
+        self.assertIsNone(duplicate.email_normalized)
+
+        # ...and signs in with its username, since its email now resolves to the other account.
+        User.objects.filter(pk=duplicate.pk).update(is_active=True)
+        payload = {"username": duplicate.username, "password": "pw"}
+        response = self.client.post("/api/payments/token/", json.dumps(payload), content_type="application/json")
+        self.assertEqual(AccessToken(response.json()["access"])["user_id"], str(duplicate.pk))
+
+    def test_admin_refuses_email_held_by_another_account(self):
+        form = CustomUserChangeForm(
+            {"username": self.others[0].username, "email": "LEARNER@example.com", "date_joined": self.others[0].date_joined},
+            instance=self.others[0],
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("email", form.errors)
+        form = CustomUserCreationForm({
+            "username": "newcomer", "email": "user1@EXAMPLE.com",
+            "password1": "a-Long-passw0rd!", "password2": "a-Long-passw0rd!",
+        })
+        self.assertFalse(form.is_valid())
+        self.assertEqual(list(form.errors), ["email"])
+
+    def test_jwt_user_is_cached_until_saved(self):
+        path = f"/api/courses/{self.course.slug}/progress/"
+        self.client.get(path, **self.auth())
+        with self.assertQueryBudget(1):  # the progress summary; the user comes from the cache
+            self.assertEqual(self.client.get(path, **self.auth()).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.learner.is_active = False
+            self.learner.save(update_fields=["is_active"])
+        self.assertEqual(self.client.get(path, **self.auth()).status_code, 401)
+
+    def test_cached_jwt_user_still_checks_the_token(self):
+        path = f"/api/courses/{self.course.slug}/progress/"
+        with mock.patch.object(api_settings, "CHECK_REVOKE_TOKEN", True):
+            self.assertEqual(self.client.get(path, **self.auth()).status_code, 200)
+            stale = AccessToken.for_user(self.learner)
+            stale[api_settings.REVOKE_TOKEN_CLAIM] = "issued-before-a-password-change"
+            headers = {"HTTP_AUTHORIZATION": f"Bearer {stale}"}
+            with self.assertQueryBudget(0):  # refused from the cached user
+                self.assertEqual(self.client.get(path, **headers).status_code, 401)
+
+    def test_token_refresh(self):
+        refresh = RefreshToken.for_user(self.learner)
+        # User, purchases for the ``courses`` claim, the revocation of the rotated token, and at most one
+        # top-up of the revocation Bloom filter. No table of issued tokens is read or grows.
+        with self.assertQueryBudget(4):
+            response = self.client.post(
+                "/api/payments/token/refresh/", json.dumps({"refresh": str(refresh)}), content_type="application/json"
+            )
+        self.assertIn("access", response.json())
+
+    def test_rotated_refresh_token_is_refused(self):
+        refresh = self.login()["refresh"]
+        first = self.refresh(refresh)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotEqual(first.json()["refresh"], refresh)
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+        # Still refused when the cache has lost the revocation.
+        cache.clear()
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+        self.assertEqual(self.refresh(first.json()["refresh"]).status_code, 200)
+
+    def test_expired_revocations_are_pruned(self):
+        RevokedToken.objects.create(jti="old", expires_at=timezone.now() - timedelta(seconds=1))
+        RevokedToken.objects.create(jti="current", expires_at=timezone.now() + timedelta(days=1))
+        run_maintenance()
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["current"])
+
+    def test_token_refresh_updates_courses_claim(self):
+        buyer = self.others[1]
+        refresh = self.login("user1@example.com", "pw")["refresh"]
+        with self.captureOnCommitCallbacks(execute=True):
+            CoursePurchase.objects.create(user=buyer, course=self.course)
+        response = self.client.post(
+            "/api/payments/token/refresh/", json.dumps({"refresh": refresh}), content_type="application/json"
+        )
+        access = AccessToken(response.json()["access"])
+        self.assertEqual(access[COURSES_CLAIM], [self.course.id])
+
+    def refresh(self, token):
+        return self.client.post("/api/payments/token/refresh/", json.dumps({"refresh": token}), content_type="application/json")
+
+    def login(self, email="learner@example.com", password="pw-learner-1"):
+        payload = {"email": email, "password": password}
+        return self.client.post("/api/payments/token/", json.dumps(payload), content_type="application/json").json()
+
+
+class RevokedFilterTests(TestCase):
+    def setUp(self):
+        blacklist._filter = None
+        self.addCleanup(setattr, blacklist, "_filter", None)
+
+    def revoke(self, count):
+        expires_at = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=f"jti-{RevokedToken.objects.count()}-{i}", expires_at=expires_at) for i in range(count)]
+        )
+
+    @override_settings(TOKEN_BLACKLIST={"BLOOM_CAPACITY": 10, "BLOOM_ERROR_RATE": 0.01, "SYNC_INTERVAL": 0})
+    def test_filter_grows_past_capacity_instead_of_rebuilding_every_top_up(self):
+        self.revoke(25)
+        self.assertEqual(blacklist._revoked_filter().count, 25)  # built at the configured capacity, overfull
+        rebuilt = blacklist._revoked_filter()
+        self.assertEqual((rebuilt.capacity, rebuilt.count), (50, 25))
+        self.revoke(5)
+        # A top-up only reads the new rows.
+        with self.assertNumQueries(1):
+            self.assertIs(blacklist._revoked_filter(), rebuilt)
+        self.assertEqual(rebuilt.count, 30)
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+        self.assertLess(false_positives, 300)
+
+
+class PasswordHashingPoolTests(SimpleTestCase):
+    @override_settings(PASSWORD_HASHING={"CONCURRENCY": 1, "MAX_QUEUE": 1})
+    def test_queue_depth_is_bounded(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        async def wait_for(**expected):
+            while {k: hashing.stats()[k] for k in expected} != expected:
+                await asyncio.sleep(0.001)
+
+        async def burst():
+            first = asyncio.ensure_future(hashing.run(release.wait))
+            await wait_for(running=1, queued=0)
+            second = asyncio.ensure_future(hashing.run(release.wait))
+            await wait_for(running=1, queued=1)
+            with self.assertRaises(hashing.HashingOverloaded), self.assertLogs(hashing.__name__, "WARNING"):
+                await hashing.run(release.wait)
+            release.set()
+            return await asyncio.gather(first, second)
+
+        self.assertEqual(asyncio.run(burst()), [True, True])
+        self.assertEqual(hashing.stats(), {"concurrency": 1, "running": 0, "queued": 0})
+
+
+class ReconcilePurchasesTests(CatalogDataMixin, TestCase):
+    def export_rows(self):
+        buyers = self.others
+        return [
+            # Checkout Sessions with metadata, one of them twice.
+            *({"id": f"cs_{u.id}", "metadata": {"user_id": str(u.id), "course_slug": self.courses[1].slug}} for u in buyers),
+            {"id": "cs_dup", "metadata": {"user_id": str(buyers[0].id), "course_slug": self.courses[1].slug}},
+            # Payment Link sessions: matched by email, course from --course.
+            {"id": "cs_link", "customer_details": {"email": "USER1@example.com"}, "payment_status": "paid"},
+            {"id": "cs_unpaid", "customer_details": {"email": "user2@example.com"}, "payment_status": "unpaid"},
+            {"id": "cs_ghost", "customer_details": {"email": "nobody@example.com"}},
+            # Already recorded.
+            {"id": "cs_old", "metadata": {"user_id": str(self.learner.id), "course_slug": self.course.slug}},
+        ]
+
+    def reconcile_file(self, suffix, content, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False) as fh:
+            fh.write(content)
+        self.addCleanup(os.remove, fh.name)
+        out = StringIO()
+        call_command("reconcile_purchases", fh.name, "--course", self.courses[2].slug, *args, stdout=out)
+        return out.getvalue()
+
+    def assertReconciled(self, output):
+        self.assertIn("Read 10 sessions", output)
+        self.assertIn("8 matched, 1 unmatched, 1 unpaid", output)
+        self.assertIn("Created 6 purchases.", output)
+        self.assertEqual(CoursePurchase.objects.filter(course=self.courses[1]).count(), len(self.others))
+        self.assertTrue(CoursePurchase.objects.filter(user=self.others[1], course=self.courses[2]).exists())
+
+    def csv_export(self, statuses=True):
+        header = ["id", "Customer Email", "user_id (metadata)", "course_slug (metadata)"]
+        lines = [",".join(header + ["Payment Status"] * statuses)]
+        for row in self.export_rows():
+            meta = row.get("metadata", {})
+            cells = [
+                row["id"], row.get("customer_details", {}).get("email", ""),
+                meta.get("user_id", ""), meta.get("course_slug", ""),
+            ]
+            lines.append(",".join(cells + [row.get("payment_status", "paid")] * statuses))
+        return "\n".join(lines)
+
+    def test_csv_export(self):
+        self.assertReconciled(self.reconcile_file(".csv", self.csv_export()))
+
+    def test_csv_blank_status_is_not_paid(self):
+        content = self.csv_export().replace(",paid", ",", 1)
+        self.assertIn("7 matched, 1 unmatched, 2 unpaid", self.reconcile_file(".csv", content))
+
+    def test_csv_without_status_column_counts_every_session_as_paid(self):
+        self.assertIn("9 matched, 1 unmatched, 0 unpaid", self.reconcile_file(".csv", self.csv_export(statuses=False)))
+
+    def test_json_array_export(self):
+        with mock.patch("payments.reconcile.READ_SIZE", 7):  # values straddle every read
+            self.assertReconciled(self.reconcile_file(".json", json.dumps(self.export_rows(), indent=2)))
+
+    def test_ndjson_export_is_idempotent(self):
+        content = "\n".join(json.dumps(row) for row in self.export_rows())
+        self.assertIn("Would create 6 purchases.", self.reconcile_file(".ndjson", content, "--dry-run"))
+        self.assertReconciled(self.reconcile_file(".ndjson", content))
+        self.assertIn("Created 0 purchases.", self.reconcile_file(".ndjson", content))
+
+    def test_queries_do_not_grow_with_rows(self):
+        records = [
+            {"session_id": f"cs_{i}", "payment_intent": "", "email": "", "payment_status": "paid",
+             "user_id": str(self.others[i % len(self.others)].id), "course_slug": self.courses[i % COURSES].slug}
+            for i in range(2000)
+        ]
+        # Courses, then users, existing purchases and the insert per chunk.
+        with self.assertQueryBudget(1 + 2 * 3):
+            stats = reconcile(records, chunk_size=1000)
+        self.assertEqual(stats["created"], len(self.others) * COURSES)
@@ -0,0 +1,34 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import is_revoked, revoke
+from .entitlements import COURSES_CLAIM, entitled_course_ids
+
+
+class EntitlementRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens always carry the user's current ``courses`` claim.
+
+    Revocation goes through ``payments.blacklist`` rather than the ``token_blacklist`` app, so
+    ``BLACKLIST_AFTER_ROTATION`` takes effect without an ever-growing token table.
+    """
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access[COURSES_CLAIM] = sorted(entitled_course_ids(self.payload[api_settings.USER_ID_CLAIM]))
+        return access
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        if not revoke(self.payload):
+            raise TokenError(_("Token is blacklisted"))
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import CreatePaymentLinkView, stripe_webhook, CheckCourseAccessView, HandlePaymentSuccessView
-from .views_auth import RegisterView, MyTokenObtainPairView
+from .views_auth import register, token_obtain_pair
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
@@ -9,8 +9,8 @@ urlpatterns = [
     path('check-access/<str:course_slug>/', CheckCourseAccessView.as_view(), name='check-course-access'),
     path('payment-success/', HandlePaymentSuccessView.as_view(), name='payment-success'),
     path('webhook/', stripe_webhook),
-    path('register/', RegisterView.as_view(), name='register'),
-    path('token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('register/', register, name='register'),
+    path('token/', token_obtain_pair, name='token_obtain_pair'),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 
 ]
\ No newline at end of file
@@ -1,56 +1,34 @@
-from rest_framework import generics
-from rest_framework.permissions import AllowAny
+import json
+
+from asgiref.sync import sync_to_async
 from .serializers import RegisterSerializer
-from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.contrib.auth import aauthenticate, get_user_model
+from django.contrib.auth.models import update_last_login
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from rest_framework import serializers
+from . import hashing
+from .tokens import EntitlementRefreshToken
 
 User = get_user_model()
 
-class RegisterView(generics.CreateAPIView):
-    queryset = User.objects.all()
-    permission_classes = [AllowAny]
-    serializer_class = RegisterSerializer
+NO_ACCOUNT = "No active account found with the given credentials"
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
-    email = serializers.EmailField(write_only=True, required=True)
-    # Make username optional so clients can omit it when logging in with email
-    username = serializers.CharField(write_only=True, required=False, allow_blank=True)
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Ensure base username field isn't required
-        if self.username_field in self.fields:
-            self.fields[self.username_field].required = False
-            self.fields[self.username_field].allow_blank = True
-            self.fields[self.username_field].write_only = True
+    # Issues the tokens for token_obtain_pair, which authenticates the user itself. Access tokens
+    # carry the purchased course IDs (see payments.entitlements.COURSES_CLAIM).
+    token_class = EntitlementRefreshToken
 
-    def validate(self, attrs):
-        email = attrs.get('email')
-        password = attrs.get('password')
-
-        if not email:
-            raise serializers.ValidationError({"email": "This field is required."})
-        if not password:
-            raise serializers.ValidationError({"password": "This field is required."})
-
-        try:
-            user = User.objects.get(email__iexact=email.strip().lower())
-        except User.DoesNotExist:
-            raise serializers.ValidationError({"detail": "No active account found with the given credentials"})
-        except User.MultipleObjectsReturned:
-            # If duplicates exist with different casing, pick the earliest created active user
-            user = User.objects.filter(email__iexact=email.strip().lower(), is_active=True).order_by('date_joined').first()
-            if not user:
-                raise serializers.ValidationError({"detail": "No active account found with the given credentials"})
-
-        data = super().validate({
-            self.username_field: getattr(user, self.username_field),
-            'password': password,
-        })
-
-        return data
+    @classmethod
+    def login(cls, user) -> dict:
+        """Issue the token pair for an authenticated ``user``."""
+        refresh = cls.get_token(user)
+        if api_settings.UPDATE_LAST_LOGIN:
+            update_last_login(None, user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
 
     @classmethod
     def get_token(cls, user):
@@ -59,5 +37,76 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['has_paid'] = user.has_paid
         return token
 
-class MyTokenObtainPairView(TokenObtainPairView):
-    serializer_class = MyTokenObtainPairSerializer
\ No newline at end of file
+class EmailLoginSerializer(serializers.Serializer):
+    """
+    Field validation for the async login view; credentials are checked by ``aauthenticate``.
+    ``username`` signs in accounts whose email another account holds (see payments.backends).
+    """
+    email = serializers.EmailField(required=False)
+    username = serializers.CharField(required=False)
+    password = serializers.CharField(trim_whitespace=False)
+
+    def validate(self, attrs):
+        if not attrs.get('email') and not attrs.get('username'):
+            raise serializers.ValidationError({"email": ["This field is required."]})
+        return attrs
+
+
+# Async login and registration. Under ASGI (config.asgi) password hashing runs in the bounded
+# payments.hashing pool, so a login burst queues there instead of occupying request workers.
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
+
+
+def _overloaded():
+    response = JsonResponse({"detail": "Too many sign-ins in progress, please retry."}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def token_obtain_pair(request):
+    try:
+        serializer = EmailLoginSerializer(data=_request_data(request))
+    except ValueError as exc:
+        return JsonResponse({"detail": f"JSON parse error - {exc}"}, status=400)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        user = await aauthenticate(request, **serializer.validated_data)
+    except hashing.HashingOverloaded:
+        return _overloaded()
+    if user is None:
+        return JsonResponse({"detail": NO_ACCOUNT}, status=400)
+    return JsonResponse(await sync_to_async(MyTokenObtainPairSerializer.login)(user))
+
+
+@csrf_exempt
+@require_POST
+async def register(request):
+    try:
+        serializer = RegisterSerializer(data=_request_data(request))
+    except ValueError as exc:
+        return JsonResponse({"detail": f"JSON parse error - {exc}"}, status=400)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        password_hash = await hashing.ahash(serializer.validated_data['password'])
+    except hashing.HashingOverloaded:
+        return _overloaded()
+    try:
+        await sync_to_async(serializer.save)(password_hash=password_hash)
+    except serializers.ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    return JsonResponse(serializer.data, status=201)
+
+
+class EntitlementTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-reads the user's purchases on every refresh, so the ``courses`` claim never outlives an access token."""
+    token_class = EntitlementRefreshToken
\ No newline at end of file
@@ -98,8 +98,15 @@ export const useCourse = (): UseCourseReturn => {
         try {
             setLoadingStates(prev => ({ ...prev, courses: true }));
             setLoading(true);
-            const response = await api.get("/api/courses/");
-            setCourses(response.data);
+            // The list is cursor-paginated: follow the `next` links until the last page.
+            const all: Course[] = [];
+            let url: string | null = "/api/courses/";
+            while (url) {
+                const response: { data: { next: string | null; results: Course[] } } = await api.get(url);
+                all.push(...response.data.results);
+                url = response.data.next;
+            }
+            setCourses(all);
         } catch (err: any) {
             console.error("Error fetching courses:", err);
             console.error("Error details:", err.response?.data);
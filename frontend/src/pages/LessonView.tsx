@@ -23,12 +23,49 @@ type LessonBlock = {
     links?: { title: string; url: string }[];
 };
 
+type LessonLink = {
+    chapter_slug: string;
+    number: number;
+};
+
 type Lesson = {
     id: number;
     title: string;
     number: number;
     is_free_preview: boolean;
     blocks: LessonBlock[];
+    next?: LessonLink | null;
+};
+
+type LessonBundleEntry = {
+    chapter_slug: string;
+    number: number;
+    locked: boolean;
+    etag: string | null;
+    lesson: Lesson | null;
+};
+
+// Lessons fetched ahead by the bundle endpoint with their ETags, keyed by "course/chapter/number".
+// Held for one user only: cleared when someone else signs in or nobody is signed in.
+const prefetchedLessons = new Map<string, { lesson: Lesson; etag: string }>();
+let prefetchedFor: string | null = null;
+
+const lessonKey = (courseSlug: string, chapterSlug: string, number: string | number) =>
+    `${courseSlug}/${chapterSlug}/${number}`;
+
+// Fetch the lesson and the next few after it, keeping the unlocked ones for later navigation
+const prefetchBundle = async (courseSlug: string, chapterSlug: string, number: string | number) => {
+    const res = await api.get(`/api/courses/${courseSlug}/${chapterSlug}/${number}/bundle/`);
+    const entries = res.data.lessons as LessonBundleEntry[];
+    entries.forEach(entry => {
+        if (entry.lesson && entry.etag) {
+            prefetchedLessons.set(lessonKey(courseSlug, entry.chapter_slug, entry.number), {
+                lesson: entry.lesson,
+                etag: entry.etag,
+            });
+        }
+    });
+    return entries;
 };
 
 type Chapter = { 
@@ -62,7 +99,7 @@ type CourseWithStructure = {
 export default function LessonView() {
     const { courseSlug, chapterSlug, number } = useParams();
     const navigate = useNavigate();
-    const { isAuthenticated, initialLoading } = useAuth();
+    const { isAuthenticated, initialLoading, user } = useAuth();
     const { hasCourseAccess, completeLesson, getCourseProgress, isLessonCompleted } = useCourse();
     
     // Function to convert video URLs to embed format
@@ -135,19 +172,58 @@ export default function LessonView() {
         setLoading(true);
         setError(null);
         
+        const owner = isAuthenticated ? (user?.email ?? null) : null;
+        if (prefetchedFor !== owner) {
+            prefetchedLessons.clear();
+            prefetchedFor = owner;
+        }
         if (!isAuthenticated || !courseSlug || !chapterSlug || !number) return;
 
-        // Load lesson
-        api.get(`/api/courses/${courseSlug}/${chapterSlug}/${number}/`)
-            .then(res => {
-                if (!mounted) return;
-                setLesson(res.data);
+        const key = lessonKey(courseSlug, chapterSlug, number);
+        const cached = prefetchedLessons.get(key);
+        if (cached) {
+            // Show the prefetched copy straight away and revalidate it: unchanged, the server answers 304
+            setLesson(cached.lesson);
+            setLoading(false);
+            api.get(`/api/courses/${courseSlug}/${chapterSlug}/${number}/`, {
+                headers: { "If-None-Match": cached.etag },
+                validateStatus: status => (status >= 200 && status < 300) || status === 304,
             })
-            .catch(err => {
-                if (!mounted) return;
-                setError(err?.response?.data?.detail || "Failed to load lesson.");
-            })
-            .finally(() => mounted && setLoading(false));
+                .then(res => {
+                    if (!mounted) return;
+                    let current = cached.lesson;
+                    if (res.status === 200) {
+                        current = res.data as Lesson;
+                        const etag = res.headers["etag"];
+                        if (etag) prefetchedLessons.set(key, { lesson: current, etag });
+                        else prefetchedLessons.delete(key);
+                        setLesson(current);
+                    }
+                    // Only fetch past the prefetched window, once the next lesson is not held
+                    const next = current.next;
+                    if (next && !prefetchedLessons.has(lessonKey(courseSlug, next.chapter_slug, next.number))) {
+                        prefetchBundle(courseSlug, next.chapter_slug, next.number).catch(() => {
+                            // Silently fail - the lesson is fetched when opened
+                        });
+                    }
+                })
+                .catch(err => {
+                    // Keep showing the copy when offline; drop it once the server refuses the lesson
+                    if (!err?.response) return;
+                    prefetchedLessons.delete(key);
+                    if (!mounted) return;
+                    setLesson(null);
+                    setError(err.response.data?.detail || "Failed to load lesson.");
+                });
+        } else {
+            prefetchBundle(courseSlug, chapterSlug, number)
+                .then(entries => mounted && setLesson(entries[0].lesson))
+                .catch(err => {
+                    if (!mounted) return;
+                    setError(err?.response?.data?.detail || "Failed to load lesson.");
+                })
+                .finally(() => mounted && setLoading(false));
+        }
 
         // Load course structure
         api.get(`/api/courses/${courseSlug}/`)
@@ -166,7 +242,7 @@ export default function LessonView() {
         return () => {
             mounted = false;
         };
-    }, [courseSlug, chapterSlug, number, isAuthenticated]);
+    }, [courseSlug, chapterSlug, number, isAuthenticated, user]);
 
 // Mark lesson as started when loaded
     useEffect(() => {